@@ -1,33 +1,89 @@
+import asyncio
 import os
-import shutil
 import sys
 import subprocess
-from fastapi import FastAPI, HTTPException, UploadFile, File
+import threading
+import time
+from collections import OrderedDict
+from fastapi import FastAPI, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # Load secrets
 load_dotenv()
 
 # Import core logic
-from utils.semantic_utils import load_semantic_index_from_path, semantic_search
-from utils.answer_generator import generate_answer
+from utils.semantic_utils import (
+    load_semantic_index_from_path, semantic_search, encode_query, get_model
+)
+from utils.answer_generator import generate_answer_async
+from utils.answer_cache import SemanticAnswerCache, conversation_scope
 import database  # <--- NEW: Import our DB module
+from build_index import build_index
+
+# Responses are serialized with orjson when it is installed (much faster than the stdlib json encoder)
+try:
+    import orjson  # noqa: F401  (ORJSONResponse needs it)
+    FastJSONResponse = ORJSONResponse
+except ImportError:
+    FastJSONResponse = JSONResponse
+
+# === Startup / Shutdown ===
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    database.init_db()
+    # Buffered chat messages are written at least every FLUSH_SECONDS, even when traffic stops
+    database.start_background_flush()
+    # Load the embedding model now, not on the first query / upload
+    get_model()
+    # Preload the most recently added books (as many as fit, see MAX_LOADED_BOOKS);
+    # older ones are loaded on their first query
+    books = database.get_recent_books(MAX_LOADED_BOOKS)
+
+    for b in reversed(books):  # oldest first, so the newest ends up most recently used
+        load_book_index(b["id"], b["index_path"])
+    yield
+    database.close_db()
+
 
 # === Setup App ===
 app = FastAPI(
     title="BookFriend API",
-    version="2.2 (Multi-book)"
+    version="2.2 (Multi-book)",
+    lifespan=lifespan,  # replaces the deprecated @app.on_event("startup")
+    default_response_class=FastJSONResponse
 )
 
 # === Global State (Multi-Tenant Cache) ===
+# Books kept in memory at once; the least recently queried one is unloaded past this
+# (it is reloaded from disk the next time someone asks about it).
+MAX_LOADED_BOOKS = 8
+
+# Seconds a finished ("done" / "failed") ingest job stays queryable at /v1/jobs/{job_id}
+JOB_TTL_SECONDS = 3600
+
+
 class AppState:
-    # Dictionary to store multiple books: { "book_id": (index, mapping) }
-    indices: Dict[str, Any] = {}
+    # Loaded books, least recently used first: { "book_id": (index, mapping) }
+    indices: "OrderedDict[str, Any]" = OrderedDict()
+    # Guards 'indices': books are loaded (and evicted) on threadpool threads while other
+    # requests look them up
+    indices_lock = threading.Lock()
+    # Ingestion jobs: { "job_id": {"job_id", "status", "title", "book_id", "error", "finished_at"} }
+    # (finished ones are forgotten JOB_TTL_SECONDS after they end, see _prune_jobs)
+    jobs: Dict[str, Dict[str, Any]] = {}
 
 state = AppState()
 
+# Near-duplicate questions (cosine >= 0.9) about the same book and chapter limit, asked after
+# the same chat history (see conversation_scope), reuse the earlier answer for 5 minutes
+# instead of running FAISS + the LLM again.
+answer_cache = SemanticAnswerCache(threshold=0.9, ttl=300.0, max_entries=256)
+
 # === Helper: Load a specific book ===
 def load_book_index(book_id: str, index_path: str):
     """Loads a specific book's index into memory if not already present."""
@@ -42,32 +98,45 @@ def load_book_index(book_id: str, index_path: str):
     # You need to update semantic_utils.py to accept a path!
     # (See Action 4 below. For now, we assume a helper exists)
     try:
-        idx, mapping = load_semantic_index_from_path(index_path)
-        state.indices[book_id] = (idx, mapping)
+        idx, mapping = load_semantic_index_from_path(index_path)  # (slow: outside the lock)
+        with state.indices_lock:
+            state.indices[book_id] = (idx, mapping)
+            evicted = []
+            while len(state.indices) > MAX_LOADED_BOOKS:
+                evicted.append(state.indices.popitem(last=False)[0])
         print(f"✅ Loaded {book_id}")
+        for evicted_id in evicted:
+            print(f"📤 Unloaded {evicted_id} (least recently used)")
     except Exception as e:
         print(f"❌ Failed to load {book_id}: {e}")
 
 
-@app.on_event("startup")
-def startup_event():
-    database.init_db()
-    # Reload all registered books from DB
-    conn = database.get_db()
-    books = conn.execute("SELECT id, index_path FROM books").fetchall()
-    conn.close()
+def get_loaded_book(book_id: str):
+    """(index, mapping) of a loaded book, marked most recently used; None if not loaded."""
+    with state.indices_lock:  # (a concurrent load could evict it between a get and move_to_end)
+        book = state.indices.get(book_id)
+        if book is not None:
+            state.indices.move_to_end(book_id)
+        return book
 
-    for b in books:
-        load_book_index(b["id"], b["index_path"])
 
 # === API Models ===
 
 class IngestResponse(BaseModel):
     message: str
-    book_id: str
+    job_id: str
+    status: str
     title: str
 
 
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str                     # "pending" | "processing" | "done" | "failed"
+    title: str
+    book_id: Optional[str] = None   # set once the book is ready to query
+    error: Optional[str] = None
+
+
 class QueryRequest(BaseModel):
     user_id: str
     book_id: str
@@ -94,17 +163,79 @@ def health_check():
 @app.get("/v1/books", response_model=List[BookListResponse])
 def list_books():
     """Returns a list of all ingested books so the frontend knows what IDs to use."""
-    conn = database.get_db()
-    rows = conn.execute("SELECT id, title, filename FROM books").fetchall()
-    conn.close()
+    rows = database.get_books()
 
     return [
         {"id": r["id"], "title": r["title"], "filename": r["filename"]}
         for r in rows
     ]
 
-@app.post("/v1/ingest", response_model=IngestResponse)
-def ingest_book(file: UploadFile = File(...)):
+# Upload is copied to disk in pieces of this size (never the whole PDF in memory at once)
+UPLOAD_CHUNK_BYTES = 1 << 20  # 1 MiB
+
+
+async def _run_script(*args, env=None):
+    """Run a helper script (e.g. ingest.py) without blocking the event loop."""
+    proc = await asyncio.create_subprocess_exec(sys.executable, *args, env=env)
+    returncode = await proc.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, [sys.executable, *args])
+
+
+async def _run_ingest(job_id, pdf_path, chapters_dir, index_path, title, safe_filename):
+    """Background part of /v1/ingest: PDF → chapters → index → DB, recording progress in state.jobs."""
+    job = state.jobs[job_id]
+    job["status"] = "processing"
+    print(f"⚙️ Processing Book {job_id} ({safe_filename})...")
+
+    try:
+        env = os.environ.copy()
+        # Pass the UUID paths to the scripts
+        await _run_script("ingest.py", pdf_path, chapters_dir, env=env)
+        # Indexing runs in-process with the already loaded model (no interpreter start + model load)
+        built = await run_in_threadpool(build_index, chapters_dir, index_path, model=get_model())
+        if not built:
+            raise RuntimeError("no index was built")
+
+        # Register in DB
+        # Use the 'safe_filename' here so the user sees a nice name
+        book_id = await run_in_threadpool(
+            database.register_book,
+            title=title,  # Original title (e.g., "Lord of Mysteries.pdf")
+            filename=safe_filename,  # Cleaned filename (e.g., "Lord_of_Mysteries.pdf")
+            index_path=index_path  # Points to the UUID index file
+        )
+
+        await run_in_threadpool(load_book_index, book_id, index_path)
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = f"Processing failed: {e}"
+        job["finished_at"] = time.monotonic()
+        print(f"❌ Book {job_id} failed: {e}")
+        return
+    finally:
+        if os.path.exists(pdf_path): os.remove(pdf_path)
+
+    job["book_id"] = book_id
+    job["status"] = "done"
+    job["finished_at"] = time.monotonic()
+    print(f"✅ Book {job_id} ready as {book_id}")
+
+
+def _prune_jobs():
+    """Forget jobs that finished more than JOB_TTL_SECONDS ago (state.jobs would grow forever)."""
+    cutoff = time.monotonic() - JOB_TTL_SECONDS
+    expired = [job_id for job_id, job in state.jobs.items() if job["finished_at"] is not None and job["finished_at"] < cutoff]
+    for job_id in expired:
+        del state.jobs[job_id]
+
+
+@app.post("/v1/ingest", response_model=IngestResponse, status_code=202)
+async def ingest_book(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+    """
+    Save the upload and return right away (202) with a job_id; chapter splitting + indexing
+    can take minutes and run in the background. Poll GET /v1/jobs/{job_id} for the book_id.
+    """
     # 1. Generate IDs
     import uuid
     process_id = str(uuid.uuid4())[:8]
@@ -118,77 +249,102 @@ def ingest_book(file: UploadFile = File(...)):
     chapters_dir = f"chapters_{process_id}"
     index_path = f"index_{process_id}.faiss"
 
-    # Save to disk using the SAFE ID, not the filename
+    # Save to disk using the SAFE ID, not the filename.
+    # Streamed chunk by chunk; the writes go through the threadpool so other requests keep flowing.
     with open(pdf_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    print(f"⚙️ Processing Book {process_id} ({safe_filename})...")
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            await run_in_threadpool(buffer.write, chunk)
+
+    # 4. Process in the background (the process_id doubles as the job id)
+    _prune_jobs()
+    state.jobs[process_id] = {
+        "job_id": process_id, "status": "pending", "title": file.filename, "book_id": None, "error": None,
+        "finished_at": None
+    }
+    background_tasks.add_task(
+        _run_ingest, process_id, pdf_path, chapters_dir, index_path, file.filename, safe_filename
+    )
 
-    try:
-        env = os.environ.copy()
-        # Pass the UUID paths to the scripts
-        subprocess.run([sys.executable, "ingest.py", pdf_path, chapters_dir], check=True, env=env)
-        subprocess.run([sys.executable, "build_index.py", chapters_dir, index_path], check=True, env=env)
-    except subprocess.CalledProcessError as e:
-        raise HTTPException(status_code=500, detail=f"Processing failed: {e}")
-    finally:
-        if os.path.exists(pdf_path): os.remove(pdf_path)
+    return {"message": "Book Accepted", "job_id": process_id, "status": "pending", "title": file.filename}
 
-    # 4. Register in DB
-    # Use the 'safe_filename' here so the user sees a nice name
-    book_id = database.register_book(
-        title=file.filename,  # Original title (e.g., "Lord of Mysteries.pdf")
-        filename=safe_filename,  # Cleaned filename (e.g., "Lord_of_Mysteries.pdf")
-        index_path=index_path  # Points to the UUID index file
-    )
 
-    load_book_index(book_id, index_path)
+@app.get("/v1/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job(job_id: str):
+    """Status of an ingestion job started by /v1/ingest (finished jobs expire after JOB_TTL_SECONDS)."""
+    # (async: runs on the event loop like _run_ingest and ingest_book, so state.jobs is
+    #  never changed from two threads at once)
+    _prune_jobs()
+    job = state.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
 
-    return {"message": "Book Processed", "book_id": book_id, "title": file.filename}
 
+def _load_book_from_db(book_id: str):
+    """Look up a book's index path and load it (blocking: SQLite + FAISS read)."""
+    index_path = database.get_book_index_path(book_id)
+    if index_path:
+        load_book_index(book_id, index_path)
 
-@app.post("/v1/query", response_model=QueryResponse)
-def query_book(req: QueryRequest):
-    # 1. Load Index if missing
-    if req.book_id not in state.indices:
-        conn = database.get_db()
-        row = conn.execute("SELECT index_path FROM books WHERE id = ?", (req.book_id,)).fetchone()
-        conn.close()
-        if row:
-            load_book_index(req.book_id, row["index_path"])
 
-        if req.book_id not in state.indices:
-            raise HTTPException(status_code=404, detail="Book not found or not indexed.")
+def _log_exchange(req: QueryRequest, answer: str):
+    """Save the question and the answer to the chat history (one transaction)."""
+    database.log_messages([
+        (req.user_id, req.book_id, "user", req.query, req.chapter_limit),
+        (req.user_id, req.book_id, "bot", answer, req.chapter_limit),
+    ])
 
-    idx, mapping = state.indices[req.book_id]
 
-    # 2. History & Search
-    history = database.get_chat_history(req.user_id, req.book_id)
+# async: the blocking steps (SQLite, embedding, FAISS) run in the threadpool and the LLM call
+# uses Groq's async client, so one worker can keep many users waiting on the LLM at once.
+# Returns the response object directly: the dict we build is already QueryResponse-shaped, so
+# FastAPI's response_model validation would be pure overhead (the schema stays in the OpenAPI docs).
+@app.post("/v1/query", response_class=FastJSONResponse, responses={200: {"model": QueryResponse}})
+async def query_book(req: QueryRequest):
+    # 1. Load Index if missing
+    if req.book_id not in state.indices:
+        await run_in_threadpool(_load_book_from_db, req.book_id)
+
+    book = get_loaded_book(req.book_id)  # (also marks it most recently used)
+    if book is None:
+        raise HTTPException(status_code=404, detail="Book not found or not indexed.")
+    idx, mapping = book
+
+    # 2. History: the answer depends on it, so it decides whether the answer cache applies
+    history = await run_in_threadpool(database.get_chat_history, req.user_id, req.book_id)
+
+    # 3. Answer cache. The scope keeps the Spoiler Shield (same book, same chapter limit only)
+    #    and includes the history the LLM sees, so users share an answer only when it was
+    #    generated in the same context (e.g. two readers' first question).
+    query_vec = await run_in_threadpool(encode_query, req.query)
+    cache_scope = conversation_scope((req.book_id, req.chapter_limit), history)
+    cached = answer_cache.get(cache_scope, query_vec[0])
+    if cached:
+        answer, sources = cached
+        await run_in_threadpool(_log_exchange, req, answer)
+        return FastJSONResponse({"answer": answer, "sources": sources})
 
     class MemoryWrapper:
         def get_context(self, limit=6): return history
 
     memory_mock = MemoryWrapper()
 
-    raw_results = semantic_search(req.query, idx, mapping)
-
-    # 3. Filter Spoilers
-    safe_results = []
-    limit = req.chapter_limit
-    for fname, chunk, _ in raw_results:
-        try:
-            chap_num = int(''.join(filter(str.isdigit, fname)))
-            if chap_num <= limit: safe_results.append((fname, chunk))
-        except:
-            safe_results.append((fname, chunk))
+    # 4. Search + Filter Spoilers (FAISS only considers chunks up to chapter_limit,
+    #    so the 3 results are the best 3 the reader is allowed to see)
+    safe_results = await run_in_threadpool(
+        semantic_search, req.query, idx, mapping,
+        top_k=3, query_vec=query_vec, max_chapter=req.chapter_limit
+    )
 
-    final_context = safe_results[:3]
+    final_context = [(fname, chunk) for fname, chunk, _ in safe_results]
     chunks_text = [c for _, c in final_context]
 
-    # 4. Answer & Log
-    answer = generate_answer(req.query, chunks_text, memory=memory_mock)
+    # 5. Answer & Log
+    answer = await generate_answer_async(req.query, chunks_text, memory=memory_mock)
+    sources = [f for f, _ in final_context]
+    if not answer.startswith("⚠️"):  # don't cache errors (missing key, Groq failure)
+        answer_cache.put(cache_scope, query_vec[0], answer, sources)
 
-    database.log_message(req.user_id, req.book_id, "user", req.query, req.chapter_limit)
-    database.log_message(req.user_id, req.book_id, "bot", answer, req.chapter_limit)
+    await run_in_threadpool(_log_exchange, req, answer)
 
-    return {"answer": answer, "sources": [f for f, _ in final_context]}
\ No newline at end of file
+    return FastJSONResponse({"answer": answer, "sources": sources})
\ No newline at end of file
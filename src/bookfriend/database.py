@@ -1,20 +1,81 @@
+import atexit
 import sqlite3
+import threading
+import time
 import uuid
+from collections import deque
 from datetime import datetime
 
 DB_NAME = "bookfriend.db"
 
+# One connection for the whole process, opened on first use (see _get_conn).
+# SQLite has a single writer anyway, so a pool would not help; reusing the connection
+# saves the file open + page cache warm-up + PRAGMAs on every call.
+# The lock serializes its use across the API's worker threads.
+_conn = None
+_lock = threading.RLock()
+
+# Chat messages are buffered and written in batches (one INSERT statement + one commit per
+# batch, see _flush): when FLUSH_EVERY messages are waiting, when the oldest has waited
+# FLUSH_SECONDS (checked on the next message, and every FLUSH_SECONDS by the background
+# flusher the API starts, see start_background_flush), before history is read, and at exit.
+# A hard crash can lose what is buffered (at most FLUSH_SECONDS' worth with the flusher).
+FLUSH_EVERY = 32
+FLUSH_SECONDS = 5.0
+_INSERT_MESSAGE = (
+    "INSERT INTO messages (user_id, book_id, sender, content, chapter_limit, timestamp) VALUES (?, ?, ?, ?, ?, ?)"
+)
+_pending = deque()  # rows for _INSERT_MESSAGE
+_pending_since = 0.0  # time.monotonic() of the oldest buffered row
+_flusher = None  # background flush thread (see start_background_flush)
+_flusher_stop = threading.Event()
+
 
 def get_db():
-    """Connect to the database (creates it if missing)."""
+    """Connect to the database (creates it if missing). The caller closes this connection."""
     conn = sqlite3.connect(DB_NAME)
     conn.row_factory = sqlite3.Row  # Allows accessing columns by name
+    # In WAL mode (see init_db) NORMAL only fsyncs at checkpoints, not on every commit;
+    # a crash can lose the last few messages but never corrupts the database.
+    conn.execute("PRAGMA synchronous=NORMAL")
     return conn
 
 
+def _get_conn():
+    """The shared connection used by the helpers below (call with _lock held)."""
+    global _conn
+    if _conn is None:
+        conn = sqlite3.connect(DB_NAME, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # Write-ahead log: readers don't block the writer (and vice versa), and a commit is an
+        # append to the log instead of a rewrite of the journal. The mode is stored in the file.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")  # see get_db
+        conn.execute("PRAGMA temp_store=MEMORY")   # sorts / temp tables never touch disk
+        conn.execute("PRAGMA cache_size=-20000")   # ~20 MB page cache (negative = KiB)
+        _conn = conn
+    return _conn
+
+
+def close_db():
+    """Close the shared connection (e.g. on API shutdown); the next helper call reopens it."""
+    global _conn
+    stop_background_flush()
+    with _lock:
+        _flush()
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+
 def init_db():
     """Create the tables if they don't exist."""
-    conn = get_db()
+    with _lock:
+        _create_tables(_get_conn())
+    print("✅ Database initialized (Tables: users, books, messages).")
+
+
+def _create_tables(conn):
     c = conn.cursor()
 
     # 1. Users Table (Who is talking?)
@@ -90,51 +151,131 @@ def init_db():
                   )
               ''')
 
+    # get_chat_history filters on (user_id, book_id) and walks ids newest first: with this
+    # index that is a range scan of just those rows, already in order (no full scan + sort)
+    c.execute('''
+              CREATE INDEX IF NOT EXISTS idx_messages_user_book_id
+                  ON messages (user_id, book_id, id DESC)
+              ''')
+
     conn.commit()
-    conn.close()
-    print("✅ Database initialized (Tables: users, books, messages).")
 
 
 # === Helper Functions for the API ===
 
 def register_book(title, filename, index_path):
     """Save a new book's metadata."""
-    conn = get_db()
     book_id = str(uuid.uuid4())[:8]  # Short ID like 'a1b2c3d4'
-    conn.execute(
-        "INSERT INTO books (id, title, filename, index_path, processed_at) VALUES (?, ?, ?, ?, ?)",
-        (book_id, title, filename, index_path, datetime.now().isoformat())
-    )
-    conn.commit()
-    conn.close()
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT INTO books (id, title, filename, index_path, processed_at) VALUES (?, ?, ?, ?, ?)",
+            (book_id, title, filename, index_path, datetime.now().isoformat())
+        )
+        conn.commit()
     return book_id
 
 
+def get_books():
+    """All registered books: rows with id, title, filename."""
+    with _lock:
+        return _get_conn().execute("SELECT id, title, filename FROM books").fetchall()
+
+
+def get_recent_books(limit):
+    """The 'limit' most recently processed books, newest first: rows with id, index_path."""
+    with _lock:
+        return _get_conn().execute(
+            "SELECT id, index_path FROM books ORDER BY processed_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+
+
+def get_book_index_path(book_id):
+    """Index path of a registered book, or None."""
+    with _lock:
+        row = _get_conn().execute("SELECT index_path FROM books WHERE id = ?", (book_id,)).fetchone()
+    return row["index_path"] if row else None
+
+
+def _flush():
+    """Write every buffered chat message in one transaction."""
+    with _lock:
+        if not _pending:
+            return
+        conn = _get_conn()
+        with conn:  # commits (or rolls back) the whole batch
+            conn.executemany(_INSERT_MESSAGE, list(_pending))
+        _pending.clear()
+
+
+atexit.register(_flush)
+
+
+def start_background_flush():
+    """
+    Flush buffered messages every FLUSH_SECONDS on a daemon thread, so they reach the file
+    (and other processes reading it) even when no further message arrives. Stopped by close_db.
+    """
+    global _flusher
+    with _lock:
+        if _flusher is not None:
+            return
+        _flusher_stop.clear()
+        _flusher = threading.Thread(target=_flush_loop, name="db-flush", daemon=True)
+        _flusher.start()
+
+
+def stop_background_flush():
+    """Stop the background flusher (if running); buffered messages are left for close_db / exit."""
+    global _flusher
+    thread = _flusher
+    if thread is None:
+        return
+    _flusher_stop.set()
+    thread.join()  # (not under _lock: the thread may be waiting for it inside _flush)
+    _flusher = None
+
+
+def _flush_loop():
+    while not _flusher_stop.wait(FLUSH_SECONDS):
+        try:
+            _flush()
+        except sqlite3.Error as e:  # e.g. database locked: the rows stay buffered, retry next time
+            print(f"⚠️ Could not write buffered chat messages: {e}")
+
+
 def log_message(user_id, book_id, sender, content, chapter_limit=0):
-    """Save a chat message to history."""
-    conn = get_db()
-    conn.execute(
-        "INSERT INTO messages (user_id, book_id, sender, content, chapter_limit, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
-        (user_id, book_id, sender, content, chapter_limit, datetime.now().isoformat())
-    )
-    conn.commit()
-    conn.close()
+    """Save a chat message to history (buffered, see FLUSH_EVERY)."""
+    log_messages([(user_id, book_id, sender, content, chapter_limit)])
+
+
+def log_messages(rows):
+    """
+    Save several chat messages (buffered and written in batches, see FLUSH_EVERY).
+    rows: iterable of (user_id, book_id, sender, content, chapter_limit).
+    """
+    global _pending_since
+    now = datetime.now().isoformat()
+    with _lock:
+        if not _pending:
+            _pending_since = time.monotonic()
+        _pending.extend((*row, now) for row in rows)
+        if len(_pending) >= FLUSH_EVERY or time.monotonic() - _pending_since >= FLUSH_SECONDS:
+            _flush()
 
 
 def get_chat_history(user_id, book_id, limit=6):
-    """Retrieve recent context for the AI."""
-    conn = get_db()
-    cursor = conn.execute('''
-                          SELECT sender, content
-                          FROM messages
-                          WHERE user_id = ?
-                            AND book_id = ?
-                          ORDER BY id DESC LIMIT ?
-                          ''', (user_id, book_id, limit))
-
-    rows = cursor.fetchall()
-    conn.close()
-
-    # Return in reverse order (chronological) for the AI
-    history = [{"role": r["sender"], "content": r["content"]} for r in rows]
-    return history[::-1]
\ No newline at end of file
+    """Retrieve recent context for the AI (the last 'limit' messages, oldest first)."""
+    with _lock:
+        _flush()  # so the messages just logged are part of it
+        # Inner query: newest 'limit' messages (via the index); outer: back to chronological order
+        cursor = _get_conn().execute('''
+                                     SELECT sender, content
+                                     FROM (SELECT id, sender, content
+                                           FROM messages
+                                           WHERE user_id = ?
+                                             AND book_id = ?
+                                           ORDER BY id DESC LIMIT ?)
+                                     ORDER BY id
+                                     ''', (user_id, book_id, limit))
+        return [{"role": r["sender"], "content": r["content"]} for r in cursor]
@@ -1,8 +1,24 @@
+import hashlib
+import json
 import os
 import sys
 import shutil
+import subprocess
 import re
-from pypdf import PdfReader
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+
+# PDF text extraction backends, fastest first (see extract_pages).
+# PyMuPDF and poppler's pdftotext parse in C; pypdf is pure Python (much slower on big books).
+try:
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
 
 # === Configuration ===
 if len(sys.argv) > 2:
@@ -14,64 +30,158 @@ else:
     OUTPUT_FOLDER = "chapters"
 
 MIN_CHAPTER_LENGTH = 500
+# "Chapter 12" headings (captured, so re.split keeps them) and the number inside one
+CHAPTER_HEADING = re.compile(r'(Chapter\s+\d+)', re.IGNORECASE)
+NUMBER = re.compile(r'\d+')
+
+PDF_WORKERS = os.cpu_count() or 1  # processes extracting page text (1 → all in this process)
+PARALLEL_MIN_PAGES = 64            # shorter PDFs are extracted in-process (pool startup costs more)
+WRITE_WORKERS = 8                  # threads writing chapter files (file I/O releases the GIL)
+MANIFEST_FILE = ".manifest.json"   # in the output folder: chapter file -> SHA-256 of its text
+
+
+def _page_count(pdf_path):
+    if fitz is not None:
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
+    return len(PdfReader(pdf_path).pages)
+
+
+def _extract_page_range(pdf_path, start, end):
+    """Text of pages start..end-1. Opens the PDF itself, so it can run in a worker process."""
+    if fitz is not None:
+        with fitz.open(pdf_path) as doc:
+            return [doc[i].get_text("text") for i in range(start, end)]
+    pages = PdfReader(pdf_path).pages
+    return [pages[i].extract_text() for i in range(start, end)]
+
+
+def _extract_with_library(pdf_path, workers=PDF_WORKERS):
+    """
+    Extract every page with PyMuPDF or pypdf. Pages are independent, so big PDFs are split
+    into one contiguous page range per worker process; the ranges come back in page order.
+    """
+    n_pages = _page_count(pdf_path)
+    if workers <= 1 or n_pages < PARALLEL_MIN_PAGES:
+        return _extract_page_range(pdf_path, 0, n_pages)
+
+    step = -(-n_pages // workers)  # ceil: one range per worker
+    starts = range(0, n_pages, step)
+    ends = [min(start + step, n_pages) for start in starts]
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        parts = ex.map(_extract_page_range, repeat(pdf_path), starts, ends)
+        return [text for part in parts for text in part]
+
+def extract_pages(pdf_path):
+    """Return the text of every page of the PDF, in order (PyMuPDF → pdftotext → pypdf)."""
+    if fitz is not None:
+        return _extract_with_library(pdf_path)
+
+    pdftotext = shutil.which("pdftotext")
+    if pdftotext:
+        result = subprocess.run([pdftotext, "-enc", "UTF-8", pdf_path, "-"], capture_output=True)
+        if result.returncode == 0:
+            # pdftotext ends every page with a form feed
+            return result.stdout.decode("utf-8", errors="replace").split("\f")
+        print(f"⚠️ pdftotext failed (exit code {result.returncode}), falling back to pypdf")
+
+    if PdfReader is None:
+        raise RuntimeError("No PDF reader available: install pymupdf or pypdf (or poppler's pdftotext)")
+    return _extract_with_library(pdf_path)
+
+
+def _write_file(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def save_chapters(output_folder, files):
+    """
+    Make output_folder hold exactly 'files' ({filename: text}) as .txt files, incrementally:
+    files whose text is unchanged since the last run (per the manifest) are left alone,
+    changed/new ones are written, and .txt files that are no longer part of the book are removed.
+    Returns the number of files written.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    manifest_path = os.path.join(output_folder, MANIFEST_FILE)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            old_manifest = json.load(f)
+    except (OSError, ValueError):
+        old_manifest = {}  # first run (or unreadable manifest): everything counts as changed
+
+    new_manifest = {name: hashlib.sha256(text.encode("utf-8")).hexdigest() for name, text in files.items()}
+
+    for name in os.listdir(output_folder):
+        if name.endswith(".txt") and name not in files:
+            os.remove(os.path.join(output_folder, name))
+
+    changed = [
+        name for name, digest in new_manifest.items()
+        if old_manifest.get(name) != digest or not os.path.exists(os.path.join(output_folder, name))
+    ]
+
+    # Write the changed files at once, overlapping the file system calls
+    with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as ex:
+        list(ex.map(_write_file, [os.path.join(output_folder, name) for name in changed], [files[name] for name in changed]))
+
+    _write_file(manifest_path, json.dumps(new_manifest, indent=0))
+    return len(changed)
+
+
+def split_chapters(full_text):
+    """
+    Yield (heading, content) for every "Chapter X" heading in full_text, content being the
+    text up to the next heading (text before the first heading is skipped).
+    Only the match positions are kept; each content is sliced out once, when it is reached.
+    """
+    matches = list(CHAPTER_HEADING.finditer(full_text))
+    ends = [m.start() for m in matches[1:]] + [len(full_text)]
+    for m, end in zip(matches, ends):
+        yield m.group(1), full_text[m.end():end]
+
 
 def ingest_pdf(pdf_path, output_folder):
     if not os.path.exists(pdf_path):
         print(f"❌ Error: File not found at {pdf_path}")
         return
 
-    # === SAFETY FIX: Only delete/create folder INSIDE the function ===
-    if os.path.exists(output_folder):
-        shutil.rmtree(output_folder)
-    os.makedirs(output_folder)
-    print(f"📂 Created folder: {output_folder}")
-
     print(f"📖 Reading {pdf_path}...")
     try:
-        reader = PdfReader(pdf_path)
-        full_text = ""
-        for i, page in enumerate(reader.pages):
-            text = page.extract_text()
-            if text:
-                full_text += text + "\n"
+        # Join the page texts once ('full_text += ...' per page re-copies the whole book
+        # so far every time, which is quadratic for long PDFs)
+        full_text = "".join(text + "\n" for text in extract_pages(pdf_path) if text)
 
-        # 1. Try splitting by "Chapter X"
-        pattern = r'(Chapter\s+\d+)'
-        chapters = re.split(pattern, full_text, flags=re.IGNORECASE)
-
-        saved_count = 0
+        # filename -> file text. A dict, so if a heading repeats, the later chapter wins
+        # (as when the files were written one after another).
+        files = {}
 
-        # If regex worked (found more than just the start), process chapters
-        if len(chapters) > 1:
-            for i in range(1, len(chapters), 2):
-                chapter_title = chapters[i].strip()
-                chapter_content = chapters[i + 1].strip()
+        # 1. Try splitting by "Chapter X"
+        for chapter_title, chapter_content in split_chapters(full_text):
+            chapter_title = chapter_title.strip()
+            chapter_content = chapter_content.strip()
 
-                if len(chapter_content) < MIN_CHAPTER_LENGTH:
-                    continue
+            if len(chapter_content) < MIN_CHAPTER_LENGTH:
+                continue
 
-                try:
-                    number = re.search(r'\d+', chapter_title).group()
-                    safe_title = f"chapter_{int(number):03d}"
-                except:
-                    safe_title = chapter_title.replace(" ", "_").lower()
+            try:
+                number = NUMBER.search(chapter_title).group()
+                safe_title = f"chapter_{int(number):03d}"
+            except:
+                safe_title = chapter_title.replace(" ", "_").lower()
 
-                filename = f"{safe_title}.txt"
-                with open(os.path.join(output_folder, filename), "w", encoding="utf-8") as f:
-                    f.write(chapter_title + "\n\n" + chapter_content)
-                saved_count += 1
+            files[f"{safe_title}.txt"] = chapter_title + "\n\n" + chapter_content
 
         # === 🛡️ FALLBACK MODE (The Fix) ===
         # If we found 0 chapters (maybe it says "Night 1" or has no headers),
         # just save the whole thing as one file. The Indexer will chunk it anyway.
-        if saved_count == 0:
+        if not files:
             print("⚠️ No 'Chapter X' headings found. Switching to Fallback Mode (Saving full text).")
-            filename = "full_text.txt"
-            with open(os.path.join(output_folder, filename), "w", encoding="utf-8") as f:
-                f.write(full_text)
-            saved_count = 1
+            files = {"full_text.txt": full_text}
 
-        print(f"🎉 Success! Extracted {saved_count} text chunks into '{output_folder}/'.")
+        # Only chapters that changed since the last run into this folder are rewritten
+        written = save_chapters(output_folder, files)
+        print(f"🎉 Success! Extracted {len(files)} text chunks into '{output_folder}/' ({written} new or changed).")
 
     except Exception as e:
         print(f"💥 Something went wrong: {e}")
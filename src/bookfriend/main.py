@@ -7,6 +7,7 @@ This module orchestrates the main CLI flow for bookfriend.
 from dotenv import load_dotenv
 import os
 import sys
+from collections import deque
 
 # === Environment Setup ===
 load_dotenv()
@@ -16,7 +17,7 @@ load_dotenv()
 from utils.command_router import handle_command
 from utils.context_memory import suggest_related
 from memory import ChatMemory
-from utils.collect_all_matches import collect_all_matches
+from utils.collect_all_matches import collect_all_matches, preload_chapters
 from utils.config import CASE_SENSITIVE_MODE, SESSION_PATH, MAX_HISTORY
 from utils.export_to_csv import export_to_csv
 from utils.highlight import build_keyword_color_map, CHAPTERS_FOLDER
@@ -29,13 +30,17 @@ def main():
     """Main controller for bookfriend CLI."""
     # === Load or Initialize User Session ===
     session_data = session_utils.load_session(SESSION_PATH)
-    session_data.setdefault("search_history", [])
+    # A deque: appending past MAX_HISTORY drops the oldest search in O(1)
+    # (save_session writes it as a plain JSON list)
+    session_data["search_history"] = deque(session_data.get("search_history", []), maxlen=MAX_HISTORY)
     session_data.setdefault("total_search_count", 0)
     session_data.setdefault("favorites", [])
 
     # Load chapter range from session if it exists
     chapter_range = session_data.get("chapter_range", None)
     search_this_session = 0
+    # Saves session_data in the background after changes (batched, at most once a second)
+    session_writer = session_utils.SessionWriter(session_data, SESSION_PATH)
 
     # === Verify Chapter Data Directory ===
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -45,6 +50,10 @@ def main():
         print("👉 Run 'ingest.py' first!")
         sys.exit(1)
 
+    # Read every chapter once now; keyword searches then reuse the decoded text
+    # (a chapter is only re-read if its file changes)
+    preload_chapters(CHAPTERS_FOLDER)
+
     # === Display Mode Info ===
     mode_label = "CASE-SENSITIVE" if CASE_SENSITIVE_MODE else "CASE-INSENSITIVE"
     print(f"\n📘 bookfriend — Multi-keyword & Semantic Search ({mode_label} mode)")
@@ -72,7 +81,7 @@ def main():
             raw_input_val = input("\n🔍 Enter keyword(s) or command: ").strip()
         except (EOFError, KeyboardInterrupt):
             print("\n🛑 Exiting.")
-            session_utils.save_session(session_data, SESSION_PATH)
+            session_writer.mark_dirty()
             break
 
         if not raw_input_val:
@@ -85,7 +94,8 @@ def main():
             chapter_range,
             semantic_index,
             semantic_mapping,
-            memory
+            memory,
+            session_writer=session_writer
         )
 
         if handled == "exit":
@@ -106,36 +116,23 @@ def main():
 
             query = raw_input_val.split("semantic:", 1)[1].strip()
 
-            # 1. Retrieve MORE results than needed (to allow filtering)
-            raw_results = semantic_search(query, semantic_index, semantic_mapping, top_k=50)
-
-            if not raw_results:
-                print("⚠️ No semantic results found.")
-                continue
-
-            # 2. Apply Spoiler Shield
-            user_max_chapter = chapter_range[1] if chapter_range else 999999
-            safe_results = []
-
-            for fname, chunk, dist in raw_results:
-                # Extract number from filename (e.g. "chapter_005.txt" -> 5)
-                try:
-                    chap_num = int(''.join(filter(str.isdigit, fname)))
-                    if chap_num <= user_max_chapter:
-                        safe_results.append((fname, chunk, dist))
-                except ValueError:
-                    # If no number found, keep it safe
-                    safe_results.append((fname, chunk, dist))
-
-            # 3. Take Top 5 SAFE results
-            final_results = safe_results[:5]
+            # 1. Top 5 SAFE results, with the Spoiler Shield applied by semantic_search
+            #    (it compares the chapter numbers stored in the mapping at load time)
+            user_max_chapter = chapter_range[1] if chapter_range else None
+            final_results = semantic_search(
+                query, semantic_index, semantic_mapping, top_k=5, max_chapter=user_max_chapter
+            )
 
             if not final_results:
-                print(f"🔒 Spoiler Shield Active! Found matches, but ALL were beyond Chapter {user_max_chapter}.")
-                print("👉 Try increasing your range with 'set-range'.")
+                if user_max_chapter is None:
+                    print("⚠️ No semantic results found.")
+                else:
+                    print(f"🔒 Spoiler Shield Active! No matches up to Chapter {user_max_chapter}.")
+                    print("👉 Try increasing your range with 'set-range'.")
                 continue
 
-            print(f"\n🔎 Top Semantic Matches (Filtered to Ch. {user_max_chapter}):\n")
+            shield_label = f"Filtered to Ch. {user_max_chapter}" if user_max_chapter is not None else "All chapters"
+            print(f"\n🔎 Top Semantic Matches ({shield_label}):\n")
             for fname, chunk, dist in final_results:
                 print(f"[{fname}] (score={dist:.2f}) → {chunk[:200]}...\n")
 
@@ -175,8 +172,7 @@ def main():
 
         session_data["total_search_count"] += 1
         session_data["search_history"].append((keywords, chapter_filter, use_fuzzy))
-        if len(session_data["search_history"]) > MAX_HISTORY:
-            session_data["search_history"].pop(0)
+        session_writer.mark_dirty()
 
         # Restrict to Chapter Range
         valid_range = range(chapter_range[0], chapter_range[1] + 1) if chapter_range else None
@@ -198,7 +194,8 @@ def main():
         interactive_navigation(matches, keywords, kw_color_map)
         export_to_csv(matches, "recent_search_results.csv")
 
-        session_utils.save_session(session_data, SESSION_PATH)
+    session_writer.close()  # writes any pending change
+
 
 if __name__ == "__main__":
     try:
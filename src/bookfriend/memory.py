@@ -1,5 +1,8 @@
 from collections import deque
 
+VALID_ROLES = frozenset(("user", "assistant"))
+
+
 class ChatMemory:
     """
     Handles short-term conversation memory for bookfriend.
@@ -17,7 +20,7 @@ class ChatMemory:
         Add a new message to memory.
         role: 'user' | 'assistant'
         """
-        if role not in ("user", "assistant"):
+        if role not in VALID_ROLES:
             raise ValueError("Role must be 'user' or 'assistant'")
         self.messages.append({"role": role, "content": content})
 
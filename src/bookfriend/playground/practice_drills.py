@@ -1,3 +1,7 @@
+# n / p move one match forward / back (a number jumps straight to that index)
+STEP = {"n": 1, "p": -1}
+
+
 def navigate_matches(matches, index_number, command):
     """
  1. input is matches : list[str] and index_number: int and command: str and output new_index: int and new_match: str
@@ -8,13 +12,10 @@ def navigate_matches(matches, index_number, command):
 6. return (index_number, new_match)
     """
 
-    if command == "n":
-        index_number +=1
-    elif command == "p":
-        index_number -= 1
-    elif command.isdigit():
+    if command.isdigit():
         index_number = int(command)
-
+    elif command in STEP:
+        index_number += STEP[command]
     else:
         print("Invalid command")
     # clamp index to stay in range
@@ -0,0 +1,48 @@
+import numpy as np
+
+from bookfriend.utils.answer_cache import SemanticAnswerCache, conversation_scope
+
+
+def _unit(*xs):
+    v = np.array(xs, dtype="float32")
+    return v / np.linalg.norm(v)
+
+
+def test_semantic_answer_cache():
+    cache = SemanticAnswerCache(threshold=0.9, ttl=300.0, max_entries=2)
+    cache.put(("book", 10), _unit(1, 0, 0), "Klein is the Fool.", ["chapter_001.txt"])
+
+    # Near-duplicate query in the same scope hits; other scopes (spoiler limit) and other questions miss
+    assert cache.get(("book", 10), _unit(1, 0.1, 0)) == ("Klein is the Fool.", ["chapter_001.txt"])
+    assert cache.get(("book", 50), _unit(1, 0, 0)) is None
+    assert cache.get(("book", 10), _unit(0, 1, 0)) is None
+
+    # LRU eviction: the entry just read survives, the older unused one goes
+    cache.put(("book", 10), _unit(0, 1, 0), "Audrey.", [])
+    cache.get(("book", 10), _unit(1, 0, 0))
+    cache.put(("book", 10), _unit(0, 0, 1), "Tingen.", [])
+    assert len(cache) == 2
+    assert cache.get(("book", 10), _unit(0, 1, 0)) is None
+
+    # Expired entries are dropped
+    cache.ttl = -1
+    assert cache.get(("book", 10), _unit(1, 0, 0)) is None
+    assert len(cache) == 0
+
+
+def test_answers_depending_on_history_are_not_shared():
+    cache = SemanticAnswerCache(threshold=0.9, ttl=300.0, max_entries=8)
+    question = _unit(1, 0, 0)
+    history_a = [{"role": "user", "content": "Tell me about Klein."},
+                 {"role": "bot", "content": "Klein Moretti is ..."}]
+    history_b = [{"role": "user", "content": "Tell me about Audrey."},
+                 {"role": "bot", "content": "Audrey Hall is ..."}]
+
+    # User A asks after talking about Klein
+    cache.put(conversation_scope(("book", 10), history_a), question, "He joins the Nighthawks.", [])
+
+    # User B asks the same question after another conversation: A's answer is not reused
+    assert cache.get(conversation_scope(("book", 10), history_b), question) is None
+    assert cache.get(conversation_scope(("book", 10), []), question) is None
+    # ... but the same question in the same context is
+    assert cache.get(conversation_scope(("book", 10), list(history_a)), question) == ("He joins the Nighthawks.", [])
@@ -0,0 +1,100 @@
+from bookfriend.utils.collect_all_matches import collect_all_matches
+from bookfriend.utils.utils import keyword_in_sentence
+
+
+def write_chapters(tmp_path):
+    (tmp_path / "chapter_001.txt").write_text(
+        "Klein opened the door. The fog remained! Was it Klein? klein smiled.",
+        encoding="utf-8",
+    )
+    (tmp_path / "chapter_002.txt").write_text("Nothing to see here.", encoding="utf-8")
+    (tmp_path / "notes.md").write_text("Klein", encoding="utf-8")
+    return tmp_path
+
+
+def test_collect_all_matches_whole_words(tmp_path):
+    folder = write_chapters(tmp_path)
+
+    matches = collect_all_matches(str(folder), ["Klein", "main"])
+
+    # 'main' must not match inside 'remained'; non-.txt files are skipped
+    assert [(m.file, m.sentence, m.start, m.end, m.keyword) for m in matches] == [
+        ("chapter_001.txt", "Klein opened the door.", 0, 5, "Klein"),
+        ("chapter_001.txt", "Was it Klein?", 7, 12, "Klein"),
+        ("chapter_001.txt", "klein smiled.", 0, 5, "Klein"),
+    ]
+
+
+def test_collect_all_matches_case_sensitive_and_range(tmp_path):
+    folder = write_chapters(tmp_path)
+
+    matches = collect_all_matches(str(folder), ["klein"], case_sensitive=True)
+    assert [m.sentence for m in matches] == ["klein smiled."]
+
+    assert collect_all_matches(str(folder), ["Klein"], valid_range=range(2, 3)) == []
+
+
+def test_keyword_in_sentence():
+    assert keyword_in_sentence(["fog"], "The Fog remained.")
+    assert not keyword_in_sentence(["main"], "The fog remained.")
+
+
+def test_collect_all_matches_without_ahocorasick(tmp_path, monkeypatch):
+    from bookfriend.utils import collect_all_matches as cam
+
+    folder = write_chapters(tmp_path)
+    monkeypatch.setattr(cam, "HAS_FAST_REGEX", False)  # force the automaton path even if 'regex' is installed
+
+    def run(keywords):
+        return [(m.sentence, m.start, m.keyword) for m in collect_all_matches(str(folder), keywords)]
+
+    keyword_sets = [["Klein", "fog"], ["Klein", "klein"], ["Was it", "it"]]
+    expected = [run(kws) for kws in keyword_sets]
+
+    # Without pyahocorasick: combined alternation for plain words, per-keyword regex otherwise
+    monkeypatch.setattr(cam, "ahocorasick", None)
+    assert [run(kws) for kws in keyword_sets] == expected
+
+
+def test_has_whole_word():
+    from bookfriend.utils.whole_word_pattern import has_whole_word
+
+    assert has_whole_word("the fog remained", "fog")
+    assert has_whole_word("remained main", "main")  # first hit inside a word, second is whole
+    assert not has_whole_word("remained", "main")
+    assert not has_whole_word("main_road", "main")
+
+
+def test_collect_all_matches_large_file_and_crlf(tmp_path, monkeypatch):
+    from bookfriend.utils import collect_all_matches as cam
+
+    (tmp_path / "chapter_001.txt").write_bytes(b"Klein waited.\r\nThe fog\r\nlifted.")
+    monkeypatch.setattr(cam, "SMALL_FILE_BYTES", 4)  # force the mmap path
+
+    matches = collect_all_matches(str(tmp_path), ["fog"])
+    assert [(m.sentence, m.start) for m in matches] == [("The fog\nlifted.", 4)]
+
+
+def test_clear_caches(tmp_path):
+    from bookfriend.utils import collect_all_matches as cam
+    from bookfriend.utils.whole_word_pattern import compiled_whole_word
+
+    folder = write_chapters(tmp_path)
+    first = collect_all_matches(str(folder), ["Klein"])
+    assert cam._FILE_CACHE and compiled_whole_word.cache_info().currsize
+
+    cam.clear_caches()
+    assert not cam._FILE_CACHE and not cam._LISTING_CACHE
+    assert compiled_whole_word.cache_info().currsize == 0
+    assert collect_all_matches(str(folder), ["Klein"]) == first
+
+
+def test_collect_all_matches_thread_pool(tmp_path, monkeypatch):
+    from bookfriend.utils import collect_all_matches as cam
+
+    folder = write_chapters(tmp_path)
+    (folder / "chapter_003.txt").write_text("Klein again. And the fog.", encoding="utf-8")
+    sequential = collect_all_matches(str(folder), ["Klein", "fog"])
+
+    monkeypatch.setattr(cam, "SEARCH_WORKERS", 4)
+    assert collect_all_matches(str(folder), ["Klein", "fog"]) == sequential
@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from bookfriend import database
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_NAME", str(tmp_path / "test.db"))
+    database.close_db()
+    database.init_db()
+    yield database
+    database.close_db()
+
+
+def test_buffered_messages_are_read_back_in_order(db):
+    db.log_message("u1", "b1", "user", "Who is Klein?", 5)
+    db.log_messages([("u1", "b1", "bot", "The Fool.", 5), ("u2", "b1", "user", "Hi", 5)])
+    assert len(db._pending) == 3  # not written yet
+
+    # Reading history flushes first, so nothing just logged is missing
+    assert db.get_chat_history("u1", "b1") == [
+        {"role": "user", "content": "Who is Klein?"},
+        {"role": "bot", "content": "The Fool."},
+    ]
+    assert not db._pending
+    assert db.get_chat_history("u1", "b1", limit=1) == [{"role": "bot", "content": "The Fool."}]
+
+
+def test_buffer_flushes_when_full(db, monkeypatch):
+    monkeypatch.setattr(db, "FLUSH_EVERY", 2)
+    db.log_message("u1", "b1", "user", "one")
+    db.log_message("u1", "b1", "user", "two")
+    assert not db._pending
+    count = db._get_conn().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    assert count == 2
+
+
+def test_background_flush_writes_without_further_messages(db, monkeypatch):
+    monkeypatch.setattr(db, "FLUSH_SECONDS", 0.05)
+    db.start_background_flush()
+    db.log_message("u1", "b1", "user", "quiet process")
+    deadline = time.monotonic() + 5
+    while db._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not db._pending
+    db.stop_background_flush()
+    assert db._flusher is None
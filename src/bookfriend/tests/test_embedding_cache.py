@@ -0,0 +1,28 @@
+import numpy as np
+
+from bookfriend.utils.embedding_cache import QueryEmbeddingCache
+
+
+def test_query_embedding_cache(tmp_path):
+    path = str(tmp_path / "qemb.db")
+    cache = QueryEmbeddingCache(path, "model-a")
+    vec = np.array([0.6, 0.8, 0.0], dtype=np.float32)
+
+    assert cache.get("Who is Klein?") is None
+    cache.put("Who is Klein?", vec)
+    assert np.array_equal(cache.get("Who is Klein?"), vec)
+    assert cache.get("who is klein?") is None  # exact text only
+    cache.close()
+
+    # Persisted across instances, but never shared between models
+    assert np.array_equal(QueryEmbeddingCache(path, "model-a").get("Who is Klein?"), vec)
+    assert QueryEmbeddingCache(path, "model-b").get("Who is Klein?") is None
+
+
+def test_query_embedding_cache_drops_oldest_past_max_rows(tmp_path):
+    cache = QueryEmbeddingCache(str(tmp_path / "qemb.db"), "model-a", max_rows=2)
+    for i, query in enumerate(["one", "two", "three"]):
+        cache.put(query, np.full(3, i, dtype=np.float32))
+
+    assert cache.get("one") is None
+    assert cache.get("two") is not None and cache.get("three") is not None
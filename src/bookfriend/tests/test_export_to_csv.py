@@ -0,0 +1,17 @@
+import csv
+
+from bookfriend.utils.export_to_csv import _write_csv
+
+
+def test_write_csv_matches_csv_writer(tmp_path):
+    simple = [("chapter_001.txt", "Klein smiled", 0, 5, "Klein", False)]
+    quoted = simple + [("chapter_002.txt", 'He said, "no"', 0, 2, "He", False)]
+
+    for rows in (simple, quoted):
+        out = tmp_path / "out.csv"
+        _write_csv(rows, out)
+
+        with open(out, encoding="utf-8", newline="") as f:
+            assert list(csv.reader(f)) == [["Chapter", "Sentence", "Snippet"]] + [
+                [str(c) for c in row] for row in rows
+            ]
@@ -0,0 +1,17 @@
+import os
+
+from bookfriend.utils.open_in_pycharm import compute_match_file_line
+
+
+def test_compute_match_file_line(tmp_path):
+    path = tmp_path / "chapter_001.txt"
+    path.write_text("First line.\nSecond line has Klein.\nKlein again.", encoding="utf-8")
+
+    assert compute_match_file_line(str(path), "Second line has Klein.", 16) == (2, 17)
+    assert compute_match_file_line(str(path), "Klein again.", 0) == (3, 1)
+    assert compute_match_file_line(str(path), "Not in the file.", 0) == (None, None)
+
+    # Editing the file invalidates the cached line index
+    path.write_text("Klein again.", encoding="utf-8")
+    os.utime(path, ns=(0, 0))
+    assert compute_match_file_line(str(path), "Klein again.", 0) == (1, 1)
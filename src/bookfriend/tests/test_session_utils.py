@@ -28,3 +28,52 @@ def test_reset_session_removes_file(tmp_path):
     # Assert: file should not exist anymore
     assert not test_file.exists()
 
+
+def test_save_session_writes_deque_as_list(tmp_path):
+    from collections import deque
+
+    path = tmp_path / "session.json"
+    history = deque([(["klein"], None, False)], maxlen=2)
+    history.append((["audrey"], "chapter_01", True))
+    history.append((["tingen"], None, False))  # evicts "klein"
+    session_utils.save_session({"search_history": history}, path)
+
+    assert session_utils.load_session(path) == {
+        "search_history": [[["audrey"], "chapter_01", True], [["tingen"], None, False]]
+    }
+
+
+def test_save_session_if_changed_skips_identical_content(tmp_path):
+    path = tmp_path / "session.json"
+    data = {"chapter_range": [1, 10]}
+
+    assert session_utils.save_session_if_changed(data, path)
+    assert not session_utils.save_session_if_changed(data, path)  # nothing new
+
+    data["chapter_range"] = None
+    assert session_utils.save_session_if_changed(data, path)
+    assert session_utils.load_session(path) == {"chapter_range": None}
+
+
+def test_concurrent_saves_use_separate_temp_files(tmp_path):
+    import threading
+
+    path = tmp_path / "session.json"
+    errors = []
+
+    def save(n):
+        try:
+            for i in range(50):
+                session_utils.save_session({"writer": n, "i": i}, path)
+        except Exception as e:  # e.g. FileNotFoundError from a shared temp file
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(n,)) for n in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert session_utils.load_session(path)["i"] == 49
+    assert [p.name for p in tmp_path.iterdir()] == ["session.json"]  # no temp files left
@@ -0,0 +1,75 @@
+# utils/answer_cache.py
+#
+# In-process cache of generated answers, looked up by query *meaning* rather than exact text:
+# "Who is Klein?" and "who is klein moretti" embed to nearly the same vector, so the second
+# one can reuse the first one's answer instead of another FAISS search + LLM call.
+
+import hashlib
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """
+    Stores (answer, sources) per scope, keyed by the L2-normalized query embedding.
+    - scope: anything hashable that must match exactly, e.g. (book_id, chapter_limit),
+      so an answer is never reused for another book or a wider spoiler range.
+    - threshold: minimum cosine similarity between two queries to count as the same question.
+    - ttl: seconds an answer stays valid.
+    - max_entries: total size cap; the least recently used entry is evicted first.
+    """
+
+    def __init__(self, threshold=0.9, ttl=300.0, max_entries=256):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # id -> (scope, vec, answer, sources, created)
+        self._next_id = 0
+
+    def get(self, scope, query_vec):
+        """Return the cached (answer, sources) closest to query_vec in 'scope', or None."""
+        now = time.monotonic()
+        best_id, best_score = None, self.threshold
+        for entry_id, (entry_scope, vec, _, _, created) in list(self._entries.items()):
+            if now - created > self.ttl:
+                del self._entries[entry_id]  # expired
+                continue
+            if entry_scope != scope:
+                continue
+            score = float(np.dot(vec, query_vec))
+            if score >= best_score:
+                best_id, best_score = entry_id, score
+
+        if best_id is None:
+            return None
+        self._entries.move_to_end(best_id)  # most recently used
+        _, _, answer, sources, _ = self._entries[best_id]
+        return answer, sources
+
+    def put(self, scope, query_vec, answer, sources):
+        """Remember an answer for query_vec in 'scope' (evicting the LRU entry when full)."""
+        self._entries[self._next_id] = (scope, query_vec, answer, list(sources), time.monotonic())
+        self._next_id += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forget every cached answer."""
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def conversation_scope(scope, history):
+    """
+    Cache scope for an answer generated with 'history' (the earlier turns the LLM sees):
+    'scope' + a digest of those turns. A follow-up ("what happened to him next?") only
+    reuses an answer that was generated after the very same conversation.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for turn in history:
+        h.update(f"{turn['role']}\0{turn['content']}\0".encode("utf-8"))
+    return (*scope, h.digest())
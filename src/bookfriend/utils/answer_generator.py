@@ -1,58 +1,101 @@
 import os
-from groq import Groq
+from functools import lru_cache
+from groq import Groq, AsyncGroq
 from dotenv import load_dotenv
 
 # Load environment variables (to get GEMINI_API_KEY)
 load_dotenv()
 
 
-def generate_answer(query, context_chunks, memory=None):
-    """
-        Generates an answer using Groq (Free Tier, No Credit Card).
-        Model: Llama 3.3 70B (Fast & Smart)
-        """
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        return "⚠️ Error: Missing GROQ_API_KEY in .env file."
+# Clients are created on first use and then reused (keyed by the API key, so a changed key
+# gets a new one): building one sets up an HTTP client + connection pool every time.
+@lru_cache(maxsize=1)
+def _client(api_key):
+    return Groq(api_key=api_key)
 
-    # 1. Initialize Groq Client
-    client = Groq(api_key=api_key)
 
-    # 2. Prepare Context from RAG
-    context_text = "\n\n".join(context_chunks) if context_chunks else "No relevant excerpts found."
+@lru_cache(maxsize=1)
+def _async_client(api_key):
+    return AsyncGroq(api_key=api_key)
 
-    # 3. Construct Memory String (if provided)
-    memory_text = ""
-    if memory:
-        # Get last 6 messages to keep the conversation flowing
-        recent = memory.get_context(limit=6)
-        if recent:
-            memory_text = "\n\n--- RECENT CONVERSATION ---\n"
-            for msg in recent:
-                memory_text += f"{msg['role'].upper()}: {msg['content']}\n"
 
-    # 4. Build the Prompt
+def _build_messages(query, context_chunks, memory=None):
+    """Build the chat messages (system instructions + memory + context + question) for the LLM."""
+    # Prepare Context from RAG
+    context_text = "\n\n".join(context_chunks) if context_chunks else "No relevant excerpts found."
+
+    # Build the Prompt
     # We combine system instructions + memory + context + user question
     system_prompt = (
         "You are BookFriend, a helpful AI assistant for the novel 'Lord of the Mysteries'.\n"
         "Answer the user's question strictly based on the provided context excerpts below.\n"
         "If the answer isn't in the text, say you don't know. Do not make things up.\n\n"
     )
-    user_content =(
-        f"{memory_text}\n"
-        f"--- CONTEXT EXCERPTS ---\n{context_text}\n"
-        "------------------------\n\n"
-        f"USER QUESTION: {query}"
-    )
 
-    # 5. Generate
+    # User message pieces, joined once at the end
+    parts = []
+
+    # Memory (if provided)
+    if memory:
+        # Get last 6 messages to keep the conversation flowing
+        recent = memory.get_context(limit=6)
+        if recent:
+            parts.append("\n\n--- RECENT CONVERSATION ---\n")
+            parts.extend(f"{msg['role'].upper()}: {msg['content']}\n" for msg in recent)
+
+    parts += [
+        "\n--- CONTEXT EXCERPTS ---\n", context_text, "\n",
+        "------------------------\n\n",
+        "USER QUESTION: ", query,
+    ]
+    user_content = "".join(parts)
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content}
+    ]
+
+
+def generate_answer(query, context_chunks, memory=None):
+    """
+        Generates an answer using Groq (Free Tier, No Credit Card).
+        Model: Llama 3.3 70B (Fast & Smart)
+        """
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        return "⚠️ Error: Missing GROQ_API_KEY in .env file."
+
+    # 1. Groq Client (reused across calls)
+    client = _client(api_key)
+
+    # 2. Generate
     try:
         completion = client.chat.completions.create(
             model="llama-3.3-70b-versatile",  # Free & High Quality
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_content}
-            ],
+            messages=_build_messages(query, context_chunks, memory),
+            temperature=0.5,
+            max_tokens=1024,
+        )
+        return completion.choices[0].message.content
+    except Exception as e:
+        return f"⚠️ Groq Error: {str(e)}"
+
+
+async def generate_answer_async(query, context_chunks, memory=None):
+    """
+    Same as generate_answer, but with Groq's async client: while waiting for the LLM the
+    event loop keeps serving other requests (used by the API; the CLI uses generate_answer).
+    """
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        return "⚠️ Error: Missing GROQ_API_KEY in .env file."
+
+    client = _async_client(api_key)
+
+    try:
+        completion = await client.chat.completions.create(
+            model="llama-3.3-70b-versatile",
+            messages=_build_messages(query, context_chunks, memory),
             temperature=0.5,
             max_tokens=1024,
         )
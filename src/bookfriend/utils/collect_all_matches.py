@@ -6,24 +6,424 @@ This is your search indexer.
 """
 
 import os  # for file and path handling, launching OS commands
+import mmap  # to search raw chapter bytes without reading/decoding the whole file
+import stat  # to tell a directory from a file using one os.stat result
+from array import array  # compact int arrays for the cached sentence offsets
 import re  # for regex searching and substitution
+from bisect import bisect_right  # to map a file offset back to its sentence
+from concurrent.futures import ThreadPoolExecutor  # to scan chapter files concurrently
+from functools import lru_cache, partial
 from collections import namedtuple  # for simple structured storage (Match records)
 
 from rapidfuzz import fuzz
 
+# Optional: pyahocorasick matches every keyword in a single pass over the text.
+# If it isn't installed we fall back to one regex scan per keyword.
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+from .config import SEARCH_WORKERS
 from .make_snippet import make_snippet
-from .whole_word_pattern import whole_word_pattern
+from .whole_word_pattern import HAS_FAST_REGEX, compiled_whole_word, compiled_whole_word_bytes, is_word_char
 
 
-Match = namedtuple("Match", [
+class Match(namedtuple("Match", [
     "file",     # filename where match occurred (e.g., 'chapter0001.txt')
     "sentence", # full sentence text containing the match (original unmodified)
     "start",    # start character index of the match within the sentence (int)
     "end",      # end character index of the match within the sentence (int)
     "keyword",  # the keyword string that matched (from user input)
-    "snippet",  # short snippet string built around the match for preview
     "is_fuzzy"  # NEW: True if this match came from fuzzy search
-])
+])):
+    __slots__ = ()
+
+    @property
+    def snippet(self):
+        """
+        Short snippet string built around the match for preview.
+        Built on demand: a search can return thousands of matches, and only the ones that are
+        shown (or exported) ever need one.
+        """
+        return make_snippet(self.sentence, self.start, self.end)
+
+
+# Sentence boundary: punctuation (.!?) followed by whitespace.
+# Compiled once at import so the per-file loop doesn't pay the re cache lookup.
+# The match starts at the punctuation (it stays with its sentence: the gap is match.start() + 1
+# .. match.end()), which gives the same split as r'(?<=[.!?])\s+' but lets re skip ahead to the
+# next .!? instead of testing a lookbehind at every whitespace character.
+_SENT_END = re.compile(r'[.!?]\s+')
+
+# Word tokenizer used by fuzzy matching.
+_WORD_RE = re.compile(r"\w+")
+
+
+def _sentence_spans(content):
+    """
+    Find the sentences of 'content' (same rule as re.split(r'(?<=[.!?])\\s+')) as offsets only:
+    sentence i is content[starts[i]:ends[i]].
+    Returns (starts, ends) as two parallel int64 arrays.
+    Why offsets: the split is cached per file, and keeping a string per sentence would hold a
+    second copy of every chapter; the text is sliced only for sentences that get shown.
+    (array('q') stores 8 bytes per offset; a list of ints costs ~36.)
+    """
+    starts, ends = [], []
+    # Bind the hot-loop methods once (saves an attribute lookup per sentence)
+    add_start, add_end = starts.append, ends.append
+    pos = 0
+    for gap in _SENT_END.finditer(content):
+        add_start(pos)
+        add_end(gap.start() + 1)
+        pos = gap.end()
+    starts.append(pos)
+    ends.append(len(content))
+    return array("q", starts), array("q", ends)
+
+
+# Files up to this size are read with one os.read call (no buffered-IO layer, no mmap setup);
+# bigger ones are memory-mapped so the prefilter can reject them without reading them in full.
+# Past ~256KB the mapping also wins when the file is decoded: os.read has to copy the file into
+# a fresh bytes object first, while str(mm, "utf-8") decodes straight from the page cache.
+SMALL_FILE_BYTES = 256 * 1024
+
+
+def _read_small(fd, size):
+    """Read 'size' bytes from an open descriptor, looping only if the OS returns a short read."""
+    data = os.read(fd, size)
+    while len(data) < size:
+        chunk = os.read(fd, size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def _read_chapter(file_path, byte_patterns=None, size=None):
+    """
+    Read a chapter file as UTF-8 text (newlines normalized like text-mode open()).
+    With byte_patterns, the raw bytes are searched first: if none of the patterns hit,
+    return None without decoding the file at all.
+    'size' can be passed in when the caller already stat'ed the file (saves an fstat).
+    """
+    fd = os.open(file_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        if size is None:
+            size = os.fstat(fd).st_size
+        if size == 0:
+            return ""  # (mmap can't map empty files)
+        if size <= SMALL_FILE_BYTES:
+            data = _read_small(fd, size)
+            if byte_patterns and not any(p.search(data) for p in byte_patterns):
+                return None
+            text = data.decode("utf-8")
+        else:
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+                if byte_patterns and not any(p.search(mm) for p in byte_patterns):
+                    return None
+                # Decode straight from the mapping (mm[:] would first copy the whole file to bytes)
+                text = str(mm, "utf-8")
+    finally:
+        os.close(fd)
+    # One replace per statement, so at most two copies of a big chapter are alive at once
+    if "\r" in text:
+        text = text.replace("\r\n", "\n")
+        if "\r" in text:
+            text = text.replace("\r", "\n")
+    return text
+
+
+class _LiteralPrefilter:
+    """
+    Bytes-prefilter stand-in for a compiled pattern: .search(data) is true when any keyword's
+    literal text occurs in 'data' (ASCII case-insensitively when ignoring case, like a bytes (?i) regex).
+    Why: a literal search skips the \\b word-boundary checks — with stdlib re it rejects a file
+    much faster than the word regex does. A false positive (e.g. 'Klein' inside 'Kleiner')
+    only costs decoding that file.
+    'data' (bytes or an mmap) is searched in place, never copied.
+    """
+
+    def __init__(self, keywords, ignore_case):
+        self.needles = [kw.encode("ascii") for kw in keywords]
+        # Case-sensitive: one C-level memmem ('find') per needle. Ignoring case: one escaped
+        # alternation with re.IGNORECASE (a lowercased copy of the data would be a full copy
+        # of every mmap'ed chapter per search).
+        self.pattern = (
+            re.compile(b"|".join(re.escape(n) for n in self.needles), re.IGNORECASE)
+            if ignore_case else None
+        )
+
+    def search(self, data):
+        if self.pattern is not None:
+            return self.pattern.search(data) is not None
+        return any(data.find(n) != -1 for n in self.needles)
+
+
+def _is_boundary(text, pos):
+    """Emulate regex \\b at 'pos': a word char on exactly one side (string edges count as non-word)."""
+    before = pos > 0 and is_word_char(text[pos - 1])
+    after = pos < len(text) and is_word_char(text[pos])
+    return before != after
+
+
+@lru_cache(maxsize=32)
+def _build_automaton(keywords, case_sensitive):
+    """
+    Build an Aho-Corasick automaton over all keywords (a tuple, so the automaton is cached
+    per keyword set and a repeated search reuses it; lowercased unless case_sensitive).
+    Returns None when pyahocorasick is missing or a keyword changes length when lowercased
+    (offsets in the lowered text would no longer line up with the original).
+    """
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    needles = {}  # needle -> keywords that map to it (e.g. 'Klein' and 'klein' when ignoring case)
+    for kw in keywords:
+        needle = kw if case_sensitive else kw.lower()
+        if len(needle) != len(kw):
+            return None
+        needles.setdefault(needle, []).append(kw)
+    for needle, kws in needles.items():
+        automaton.add_word(needle, (len(needle), tuple(kws)))
+    automaton.make_automaton()
+    return automaton
+
+
+@lru_cache(maxsize=32)
+def _build_alternation(keywords, case_sensitive):
+    """
+    Compile all keywords (a tuple, so the result can be cached per keyword set) into one
+    whole-word alternation: \\b(?:(kw1)|(kw2)|...)\\b.
+    Returns (pattern, group_keywords) where group_keywords[i] holds the keywords that
+    capture group i+1 stands for, or None when the keywords aren't all plain words.
+    Why plain words only: two different words can't both match the same text whole-word,
+    so a single leftmost scan finds exactly what one finditer per keyword would.
+    (Phrases like 'Mr. Fool' can overlap other keywords and keep the per-keyword scan.)
+    """
+    groups = {}  # folded keyword -> keywords sharing it (e.g. 'Klein' and 'klein' when ignoring case)
+    for kw in keywords:
+        if not kw or not all(is_word_char(ch) for ch in kw):
+            return None
+        groups.setdefault(kw if case_sensitive else kw.casefold(), []).append(kw)
+    group_keywords = [tuple(kws) for kws in groups.values()]
+    body = "|".join("(" + re.escape(kws[0]) + ")" for kws in group_keywords)
+    pattern = re.compile(r"\b(?:" + body + r")\b", 0 if case_sensitive else re.IGNORECASE)
+    return pattern, group_keywords
+
+
+# Chapters don't change between prompts in a CLI session, so keep what we already did.
+# Entries are reused only while the file's stamp (mtime_ns, size) / folder mtime is unchanged.
+_FILE_CACHE = {}     # path -> (stamp, decoded text)
+_LOWER_CACHE = {}    # path -> (stamp, lowercased text) for the case-insensitive Aho-Corasick scan
+_FOLDED_CACHE = {}   # path -> (stamp, casefolded text) for the case-insensitive literal prefilter
+_SPANS_CACHE = {}    # path -> (stamp, (starts, ends)) sentence offsets from _sentence_spans
+_LISTING_CACHE = {}  # folder -> (folder mtime_ns, sorted [(name, path)] of .txt files)
+
+
+def clear_caches():
+    """
+    Forget every cached chapter listing, decoded text, sentence split and compiled keyword pattern.
+    Why: frees the memory held for a big book mid-session (the 'clear-cache' command);
+    the next search simply re-reads what it needs.
+    """
+    for cache in (_FILE_CACHE, _LOWER_CACHE, _FOLDED_CACHE, _SPANS_CACHE, _LISTING_CACHE):
+        cache.clear()
+    compiled_whole_word.cache_clear()
+    compiled_whole_word_bytes.cache_clear()
+    _build_alternation.cache_clear()
+    _build_automaton.cache_clear()
+
+
+def _list_chapters(folder_path):
+    """
+    Sorted (name, path) pairs for the '.txt' files in folder_path.
+    os.scandir hands back the file type and full path with each entry, so there is no
+    separate join/stat per file; the listing is re-read only when the folder changes.
+    Raises FileNotFoundError if folder_path is not a directory (same stat call as the cache check).
+    """
+    try:
+        st = os.stat(folder_path)
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISDIR(st.st_mode):
+        raise FileNotFoundError(f"Folder not found: {folder_path}")
+    mtime = st.st_mtime_ns
+    hit = _LISTING_CACHE.get(folder_path)
+    if hit and hit[0] == mtime:
+        return hit[1]
+    with os.scandir(folder_path) as it:
+        entries = sorted((e.name, e.path) for e in it if e.name.endswith(".txt") and e.is_file())
+    _LISTING_CACHE[folder_path] = (mtime, entries)
+    return entries
+
+
+def _load_chapter(file_path, byte_patterns=None):
+    """
+    Return (stamp, text) for a chapter file, where stamp is its (mtime_ns, size).
+    Decoded text is reused from _FILE_CACHE while the stamp is unchanged; on a miss the
+    file is read with _read_chapter (text is None → the prefilter found no keyword).
+    """
+    st = os.stat(file_path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    hit = _FILE_CACHE.get(file_path)
+    if hit and hit[0] == stamp:
+        return stamp, hit[1]
+    text = _read_chapter(file_path, byte_patterns, st.st_size)
+    if text is not None:
+        _FILE_CACHE[file_path] = (stamp, text)
+    return stamp, text
+
+
+def preload_chapters(folder_path):
+    """
+    Read and decode every chapter in folder_path into _FILE_CACHE up front (the CLI calls
+    this once at startup), so even the first search only stats the files instead of
+    opening and reading them. Returns the number of chapters loaded.
+    """
+    chapters = _list_chapters(folder_path)
+    for _, file_path in chapters:
+        _load_chapter(file_path)
+    return len(chapters)
+
+
+def _cached(cache, file_path, stamp, build):
+    """Return the value cached for file_path while its stamp is unchanged; otherwise build() and store it."""
+    hit = cache.get(file_path)
+    if hit and hit[0] == stamp:
+        return hit[1]
+    value = build()
+    cache[file_path] = (stamp, value)
+    return value
+
+
+def _find_hits(content, haystack, patterns, automaton, alternation=None, concurrent=False):
+    """
+    Yield (keyword, start, end) for every whole-word hit in 'content' (file offsets).
+    'haystack' is the text the automaton scans (content itself, or its lowercased copy
+    when ignoring case); it is only needed when automaton is not None.
+    Per keyword, hits come out in increasing order and never overlap (same as pat.finditer).
+    concurrent=True asks the 'regex' module to release the GIL while it scans (thread pool only:
+    it costs ~10% on a single thread, and stdlib re patterns don't accept the argument).
+    """
+    if alternation is not None:
+        # Combined-regex path: one scan for all keywords, the capture group tells which one hit
+        pattern, group_keywords = alternation
+        for m in pattern.finditer(content):
+            start, end = m.span()
+            for kw in group_keywords[m.lastindex - 1]:
+                yield kw, start, end
+        return
+
+    if automaton is None or len(haystack) != len(content):
+        # Regex path: one scan of the file per keyword
+        scan_kwargs = {"concurrent": True} if concurrent else {}
+        for kw, pat in patterns.items():
+            for m in pat.finditer(content, **scan_kwargs):
+                yield kw, m.start(), m.end()
+        return
+
+    # Aho-Corasick path: one scan of the file for all keywords, then check the \b boundaries
+    last_end = {}
+    for end_idx, (length, kws) in automaton.iter(haystack):
+        end = end_idx + 1
+        start = end - length
+        if not (_is_boundary(content, start) and _is_boundary(content, end)):
+            continue
+        for kw in kws:
+            if start >= last_end.get(kw, 0):
+                last_end[kw] = end
+                yield kw, start, end
+
+
+def _scan_file(fname, file_path, patterns, automaton, byte_patterns, case_sensitive, fuzzy, threshold,
+               alternation=None, needles=None, concurrent=False, fuzzy_labels=None):
+    """
+    Collect the Match records for one chapter file (exact + optional fuzzy hits), in the
+    same order the sentence-by-sentence scan produced them. Runs on a worker thread.
+    """
+    matches = []
+
+    # Read file content using UTF-8 encoding, skipping files that fail to open
+    try:
+        stamp, content = _load_chapter(file_path, byte_patterns)
+    except Exception as e:
+        print(f"[ERROR] Could not read '{file_path}': {e}")
+        return []
+    if content is None:
+        return []  # no keyword anywhere in this file
+
+    # Literal prefilter (only passed in for the slow stdlib-re scans): if no keyword's text occurs
+    # anywhere in the file, no regex can match either. casefold() never loses an IGNORECASE hit.
+    if needles is not None:
+        folded = content if case_sensitive else _cached(_FOLDED_CACHE, file_path, stamp, content.casefold)
+        if not any(n in folded for n in needles):
+            return []
+
+    # --- Exact matches ---
+    # Scan the whole file once (instead of one search per sentence), then map each hit
+    # back to its sentence with bisect on the sentence start offsets.
+    exact = {}  # sentence index -> {keyword: [(start, end), ...]} (offsets within the sentence)
+    # Only the Aho-Corasick path needs a lowercased copy (regexes use IGNORECASE instead)
+    haystack = content
+    if automaton is not None and not case_sensitive:
+        haystack = _cached(_LOWER_CACHE, file_path, stamp, content.lower)
+
+    hits = list(_find_hits(content, haystack, patterns, automaton, alternation, concurrent))
+    if not hits and not fuzzy:
+        return []  # nothing here → no need to split this file into sentences
+
+    # Split into sentences by a simple rule: punctuation (.!? ) followed by whitespace
+    # This is the same rule used earlier in your project and is good enough for quick previews.
+    # (split once per file version and reused by every later search)
+    starts, ends = _cached(_SPANS_CACHE, file_path, stamp, lambda: _sentence_spans(content))
+
+    # (hot loops below: bind lookups once per file instead of once per hit)
+    add_match = matches.append
+    for kw, hit_start, hit_end in hits:
+        i = bisect_right(starts, hit_start) - 1
+        start, end = hit_start - starts[i], hit_end - starts[i]
+        if hit_end > ends[i]:
+            continue  # hit spans a sentence break; the per-sentence scan never saw these
+        exact.setdefault(i, {}).setdefault(kw, []).append((start, end))
+
+    # Fuzzy mode has to look at every sentence; exact mode only at sentences with hits
+    sentence_ids = range(len(starts)) if fuzzy else sorted(exact)
+    # Lowercased keyword per keyword, looked up once instead of .lower() for every word scored
+    kw_lower = {kw: kw.lower() for kw in patterns} if fuzzy else None
+    if fuzzy_labels is None:
+        fuzzy_labels = {}
+
+    for i in sentence_ids:
+        sentence = content[starts[i]:ends[i]]  # one string per sentence, shared by its matches
+        sentence_hits = exact.get(i, {})
+        sentence_lower = sentence.lower() if fuzzy else None  # helpful for fuzzy matching
+        words = None  # fuzzy: the sentence's words, split once and shared by all keywords
+
+        for kw, pat in patterns.items():
+            for start, end in sentence_hits.get(kw, ()):
+                # Positional fields (file, sentence, start, end, keyword, is_fuzzy):
+                # building a namedtuple from keywords is ~2x slower, and this runs once per match.
+                add_match(Match(fname, sentence, start, end, kw, False))  # <-- exact
+
+            # --- Fuzzy matches (word-level) ---
+            # Only for sentences where this keyword has no exact hit
+            if fuzzy and kw not in sentence_hits:
+                if words is None:
+                    words = _WORD_RE.findall(sentence_lower)  # split into words, keep only alphanum
+                target = kw_lower[kw]
+                for word in words:
+                    score = fuzz.ratio(target, word)
+                    if score >= threshold:
+                        # Find word position in original sentence (used for the snippet)
+                        start = sentence_lower.find(word)
+                        end = start + len(word)
+                        label = fuzzy_labels.get((kw, score))
+                        if label is None:
+                            label = fuzzy_labels[(kw, score)] = f"{kw} (fuzzy {score}%)"
+                        add_match(Match(fname, sentence, start, end, label, True))
+
+    return matches
 
 
 def collect_all_matches(folder_path, keywords, case_sensitive=False, fuzzy=False, threshold=80, chapter_filter = None, valid_range = None):
@@ -38,22 +438,46 @@ def collect_all_matches(folder_path, keywords, case_sensitive=False, fuzzy=False
       - Pre-compiling regex patterns speeds up repeated matching across many sentences.
     """
     # Ensure the folder exists before proceeding — helpful early error for the user.
-    if not os.path.isdir(folder_path):
-        raise FileNotFoundError(f"Folder not found: {folder_path}")
+    # (_list_chapters raises FileNotFoundError; its one stat also validates the cached listing)
+    chapters = _list_chapters(folder_path)
 
     matches = []  # list to collect Match records
 
     # Pre-compile regex patterns per keyword (faster when scanning many sentences)
     patterns = {}
     for kw in keywords:
-        # compile pattern with correct flags (case-insensitive unless case_sensitive True)
-        patterns[kw] = re.compile(whole_word_pattern(kw), 0 if case_sensitive else re.IGNORECASE)
+        # cached compiled pattern with correct flags (case-insensitive unless case_sensitive True)
+        patterns[kw] = compiled_whole_word(kw, not case_sensitive)
+
+    # Multi-keyword matchers (both None → one regex scan per keyword).
+    # With the 'regex' module installed, one literal-accelerated scan per keyword is the fastest
+    # option for the handful of keywords people type. With stdlib re, the Aho-Corasick automaton
+    # is fastest; without pyahocorasick, plain-word keywords at least share one alternation scan.
+    alternation = automaton = None
+    if not HAS_FAST_REGEX:
+        automaton = _build_automaton(tuple(keywords), case_sensitive)
+        if automaton is None and len(keywords) > 1:
+            alternation = _build_alternation(tuple(keywords), case_sensitive)
+
+    # Byte-level prefilter so files without any keyword are never decoded.
+    # Only for exact mode (fuzzy needs every sentence) and ASCII keywords, and not when the
+    # automaton runs: its single pass over the text is already the cheaper filter.
+    # With stdlib re, plain substring checks stand in for the (slow) bytes regexes, and the
+    # decoded text gets the same literal check before the regex scan.
+    byte_patterns = needles = None
+    slow_regex = automaton is None and not HAS_FAST_REGEX
+    if automaton is None and not fuzzy and all(kw.isascii() for kw in keywords):
+        if slow_regex:
+            byte_patterns = [_LiteralPrefilter(keywords, not case_sensitive)]
+        else:
+            byte_patterns = [compiled_whole_word_bytes(kw, not case_sensitive) for kw in keywords]
+    if slow_regex and not fuzzy:
+        needles = [kw if case_sensitive else kw.casefold() for kw in keywords]
 
     # Walk files in sorted order for stable, predictable output across runs
-    for fname in sorted(os.listdir(folder_path)):
-        # Only consider files ending with .txt (case-insensitive)
-        if not fname.endswith(".txt"):
-            continue
+    # (_list_chapters only returns files ending with .txt)
+    selected = []
+    for fname, file_path in chapters:
         # ✅ Filter by chapter_range if set
         if valid_range:
             # Extract number from e.g. "chapter0005.txt"
@@ -67,61 +491,27 @@ def collect_all_matches(folder_path, keywords, case_sensitive=False, fuzzy=False
         if chapter_filter:
             if chapter_filter not in fname.lower() and chapter_filter.zfill(8) not in fname.lower():
                 continue
+        selected.append((fname, file_path))
 
-        file_path = os.path.join(folder_path, fname)
-        # Read file content using UTF-8 encoding, skipping files that fail to open
-        try:
-            with open(file_path, "r", encoding="utf-8") as fh:
-                content = fh.read()
-        except Exception as e:
-            print(f"[ERROR] Could not read '{file_path}': {e}")
-            continue
-
-        # Split into sentences by a simple rule: punctuation (.!? ) followed by whitespace
-        # This is the same rule used earlier in your project and is good enough for quick previews.
-        sentences = re.split(r'(?<=[.!?])\s+', content)
-
-        # For each sentence we check each compiled pattern using finditer to capture positions
-        for sentence in sentences:
-            sentence_lower = sentence.lower()  # helpful for fuzzy matching
-
-            for kw, pat in patterns.items():
-                #print(f"[DEBUG] Regex for '{kw}': {pat.pattern}")
-
-                # --- Exact regex matches ---
-                for m in pat.finditer(sentence):
-                    start, end = m.start(), m.end()
-                    snippet = make_snippet(sentence, start, end)
-                    matches.append(Match(
-                        file=fname,
-                        sentence=sentence,
-                        start=start,
-                        end=end,
-                        keyword=kw,
-                        snippet=snippet,
-                        is_fuzzy=False  # <-- exact
-                    ))
-
-                # --- Fuzzy matches ---
-                # --- Fuzzy matches (word-level) ---
-                if fuzzy:
-                    words = re.findall(r"\w+", sentence_lower)  # split into words, keep only alphanum
-                    for word in words:
-                        score = fuzz.ratio(kw.lower(), word)
-                        if score >= threshold and not pat.search(sentence):
-                            # Find word position in original sentence for snippet
-                            start = sentence_lower.find(word)
-                            end = start + len(word)
-                            snippet = make_snippet(sentence, start, end)
-                            matches.append(Match(
-                                file=fname,
-                                sentence=sentence,
-                                start=start,
-                                end=end,
-                                keyword=f"{kw} (fuzzy {score}%)",
-                                snippet=snippet,
-                                is_fuzzy=True
-                            ))
+    # Optionally scan files on a thread pool (see SEARCH_WORKERS in config.py): reads overlap
+    # across files, and ex.map hands results back in submission (sorted) order so output
+    # stays deterministic.
+    workers = SEARCH_WORKERS or os.cpu_count() or 1
+    threaded = workers > 1 and len(selected) > 1
+    # (fuzzy_labels: "kw (fuzzy 85.0%)" strings built once per (keyword, score) for the whole
+    #  search, so fuzzy matches share one label string. file and exact keyword strings are
+    #  already shared: they come from the cached chapter listing and the keywords list.)
+    scan = partial(_scan_file, patterns=patterns, automaton=automaton, byte_patterns=byte_patterns,
+                   case_sensitive=case_sensitive, fuzzy=fuzzy, threshold=threshold, alternation=alternation,
+                   needles=needles, concurrent=threaded and HAS_FAST_REGEX,
+                   fuzzy_labels={})
+    if threaded:
+        with ThreadPoolExecutor(max_workers=min(workers, len(selected))) as ex:
+            for file_matches in ex.map(lambda item: scan(*item), selected):
+                matches.extend(file_matches)
+    else:
+        for item in selected:
+            matches.extend(scan(*item))
 
     # Return all matched records (could be empty list if no matches)
-    return matches
\ No newline at end of file
+    return matches
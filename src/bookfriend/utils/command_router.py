@@ -2,11 +2,25 @@
 
 from .config import SESSION_PATH
 from . import session_utils
+from .collect_all_matches import clear_caches
 from bookfriend.utils.context_memory import recall_last_search
 from bookfriend.utils.memory_tools import recall_recent_queries, summarize_memory
 
-def handle_command(raw_input_val, session_data, chapter_range, semantic_index, semantic_mapping, memory):
-    """Handle user commands from main() and return (handled, updated_chapter_range)."""
+
+def _session_changed(session_data, session_writer):
+    if session_writer is not None:
+        session_writer.mark_dirty()
+    else:
+        session_utils.save_session_if_changed(session_data, SESSION_PATH)
+
+
+def handle_command(raw_input_val, session_data, chapter_range, semantic_index, semantic_mapping, memory,
+                   session_writer=None):
+    """
+    Handle user commands from main() and return (handled, updated_chapter_range).
+    Changes to session_data are handed to session_writer (a SessionWriter) when given,
+    otherwise saved right away.
+    """
 
     cmd = raw_input_val.lower()
 
@@ -28,7 +42,12 @@ def handle_command(raw_input_val, session_data, chapter_range, semantic_index, s
 
     # Save history
     if cmd == "save-history-now":
-        session_utils.save_session(session_data, SESSION_PATH)
+        if session_writer is not None:
+            # through the writer, so this never races its background save
+            session_writer.mark_dirty()
+            session_writer.flush()
+        else:
+            session_utils.save_session(session_data, SESSION_PATH)
         print("✅ Session saved.")
         return True, chapter_range
 
@@ -37,6 +56,7 @@ def handle_command(raw_input_val, session_data, chapter_range, semantic_index, s
         confirm = input("⚠️ Are you sure? (y/n): ")
         if confirm.lower() == "y":
             session_data["search_history"].clear()
+            _session_changed(session_data, session_writer)
             print("🧹 History cleared.")
         return True, chapter_range
 
@@ -46,6 +66,12 @@ def handle_command(raw_input_val, session_data, chapter_range, semantic_index, s
         print("🧹 Memory cleared. Starting a new conversation.")
         return True, None
 
+    # Drop cached chapters / compiled patterns (they are rebuilt on the next search)
+    if cmd == "clear-cache":
+        clear_caches()
+        print("🧹 Search caches cleared.")
+        return True, chapter_range
+
     # Stats
     if cmd == "stats":
         print(f"📊 Total searches ever: {session_data['total_search_count']}")
@@ -60,6 +86,7 @@ def handle_command(raw_input_val, session_data, chapter_range, semantic_index, s
             last_search = session_data["search_history"][-1]
             if last_search not in session_data["favorites"]:
                 session_data["favorites"].append(last_search)
+                _session_changed(session_data, session_writer)
                 print(f"✅ Added to favorites: {last_search}")
             else:
                 print("ℹ️ Already in favorites.")
@@ -84,7 +111,7 @@ def handle_command(raw_input_val, session_data, chapter_range, semantic_index, s
             start, end = map(int, raw.split())
             chapter_range = [start, end]
             session_data["chapter_range"] = chapter_range
-            session_utils.save_session(session_data, SESSION_PATH)
+            _session_changed(session_data, session_writer)
             print(f"✅ Range set: {start} → {end}")
         except ValueError:
             print("⚠️ Invalid input format. Please enter two numbers separated by a space (e.g., '1 50').")
@@ -102,7 +129,7 @@ def handle_command(raw_input_val, session_data, chapter_range, semantic_index, s
     if cmd == "clear-range":
         chapter_range = None
         session_data["chapter_range"] = None
-        session_utils.save_session(session_data, SESSION_PATH)
+        _session_changed(session_data, session_writer)
         print("🗑️ Range cleared. Searching all chapters.")
         return True, chapter_range
 
@@ -9,4 +9,12 @@ CASE_SENSITIVE_MODE = False  # A global setting:
 
 SESSION_PATH = "session.json"   #for saving session
 
-MAX_HISTORY = 50  # keep last 50 searches only
\ No newline at end of file
+MAX_HISTORY = 50  # keep last 50 searches only
+
+SEARCH_WORKERS = 1  # Threads used by keyword search to scan chapter files.
+                    #   1  → scan files one after another (fastest on a local disk: the regex
+                    #        work holds the GIL, so threads only add overhead).
+                    #   >1 → overlap file reads across chapters (helps on slow/network storage);
+                    #        with the 'regex' module installed the scans also release the GIL,
+                    #        so this uses several cores.
+                    #   0  → one thread per CPU (os.cpu_count()).
@@ -0,0 +1,75 @@
+# utils/embedding_cache.py
+#
+# On-disk cache of query embeddings, keyed by the SHA-256 of (model name, query text).
+# Repeated questions ("who is klein?") skip the SentenceTransformer forward pass entirely,
+# and the cache survives restarts. Stored in a small SQLite file, which several API worker
+# processes can share safely.
+
+import hashlib
+import sqlite3
+import threading
+
+import numpy as np
+
+
+class QueryEmbeddingCache:
+    """
+    Maps a query's text to its float32 embedding, persisted in the SQLite file at 'path'.
+    - model_name is part of the key, so switching models never returns stale vectors.
+    - Safe to use from several threads (one shared connection behind a lock).
+    - Holds at most max_rows embeddings (~1.5KB each); past that the oldest-written ones go.
+    """
+
+    def __init__(self, path, model_name, max_rows=50_000):
+        self.path = path
+        self.model_name = model_name
+        self.max_rows = max_rows
+        self._conn = None  # opened on first use
+        self._lock = threading.Lock()
+
+    def _key(self, query):
+        return hashlib.sha256(f"{self.model_name}\n{query}".encode("utf-8")).digest()
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")  # a lost entry is just re-encoded
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings (key BLOB PRIMARY KEY, vec BLOB)"
+            )
+        return self._conn
+
+    def get(self, query):
+        """Return the cached embedding (1-D float32 array) for 'query', or None."""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT vec FROM query_embeddings WHERE key = ?", (self._key(query),)
+            ).fetchone()
+        # (copied: frombuffer alone would be a read-only view of the row's bytes)
+        return np.frombuffer(row[0], dtype=np.float32).copy() if row else None
+
+    def put(self, query, vec):
+        """Remember the embedding of 'query'."""
+        data = np.asarray(vec, dtype=np.float32).tobytes()
+        with self._lock:
+            conn = self._db()
+            with conn:  # one transaction: the insert + any pruning
+                # (REPLACE gives the row a new, highest rowid: rowid order is write order)
+                conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, vec) VALUES (?, ?)",
+                    (self._key(query), data)
+                )
+                excess = conn.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0] - self.max_rows
+                if excess > 0:
+                    conn.execute(
+                        "DELETE FROM query_embeddings WHERE rowid IN "
+                        "(SELECT rowid FROM query_embeddings ORDER BY rowid LIMIT ?)",
+                        (excess,)
+                    )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,4 +1,47 @@
 import csv
+import re
+import shutil
+
+from .collect_all_matches import Match
+
+HEADER = ["Chapter", "Sentence", "Snippet"]
+
+# Write through a 1 MiB buffer instead of the default 8 KB (fewer write syscalls on big result sets)
+CSV_BUFFER_SIZE = 1 << 20
+
+# A cell needs csv quoting only if it contains the delimiter, the quote char or a line break
+_NEEDS_QUOTING = re.compile(r'[,"\r\n]')
+
+
+def _is_simple(row):
+    """True if csv.writer would write this row as a plain comma join (no quoting needed)."""
+    return len(row) > 1 and all(cell is not None and not _NEEDS_QUOTING.search(str(cell)) for cell in row)
+
+
+def _csv_row(row):
+    """
+    Match records are written with their snippet in its usual column
+    (file, sentence, start, end, keyword, snippet, is_fuzzy); the snippet is only built here.
+    Other rows are written as they are.
+    """
+    if isinstance(row, Match):
+        return (row.file, row.sentence, row.start, row.end, row.keyword, row.snippet, row.is_fuzzy)
+    return row
+
+
+def _write_csv(results, filename):
+    """Write the header + all result rows to 'filename' (one open, one bulk write)."""
+    results = [_csv_row(row) for row in results]
+    with open(filename, 'w', encoding = 'utf-8', newline = '', buffering = CSV_BUFFER_SIZE) as f :
+        if all(_is_simple(row) for row in results):
+            # Fast path: same bytes csv.writer would produce ("\r\n" line endings), in one write
+            lines = [",".join(HEADER)]
+            lines.extend(",".join(map(str, row)) for row in results)
+            f.write("\r\n".join(lines) + "\r\n")
+            return
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(results)
 
 
 def export_to_csv(results, filename ):
@@ -6,20 +49,12 @@ def export_to_csv(results, filename ):
         print("⚠️ Saved nothing to recent_search_results.")
         return
 
-    with open(filename, 'w', encoding = 'utf-8', newline = '') as f :
-        writer = csv.writer(f)
-        writer.writerow(["Chapter", "Sentence", "Snippet"])
-        writer.writerows(results)
+    _write_csv(results, filename)
     print("✅ your recent searches are saved in ", filename)
 
     cmd = input("\nDo you want a custom csv file for your search keywords? ( type y or yes **anything apart from that means NO**): ").strip().lower()
     if cmd in ("yes", "y"):
         custom_filename = (input("Enter your csv file name (with.csv) : ")).strip()
-        with open(custom_filename, 'w', encoding= 'utf-8', newline= '') as f:
-            writer = csv.writer(f)
-            writer.writerow(["Chapter", "Sentence", "Snippet"])
-            writer.writerows(results)
+        # Same content as the file just written: copy its bytes instead of serializing again
+        shutil.copyfile(filename, custom_filename)
         print(f"✅ Your custom CSV file is saved as {custom_filename}")
-
-
-
@@ -2,7 +2,9 @@
 # FUNCTION: highlight_keywords
 # =========================
 import os
-import re
+from functools import lru_cache
+
+from bookfriend.utils.whole_word_pattern import compiled_whole_word
 
 
 # Attempt to import colorama so colored output works on Windows.
@@ -69,24 +71,40 @@ def build_keyword_color_map(keywords):
     return mapping
 
 
+@lru_cache(maxsize=64)
+def _replacement(color, reset):
+    """
+    Build the re.sub template that wraps a match in 'color' ... 'reset'.
+    Backslashes are escaped so only \\g<0> is treated as a group reference.
+    """
+    return color.replace("\\", r"\\") + r"\g<0>" + reset.replace("\\", r"\\")
+
+
 def highlight_sentence_with_colors(sentence, matches, keywords, kw_color_map, case_sensitive=False):
     """
     Highlight keywords in 'sentence' using per-keyword colors.
     - Exact matches get their assigned color.
     - Fuzzy matches highlight the whole sentence in GREEN.
     """
-    flags = 0 if case_sensitive else re.IGNORECASE
     result = sentence
 
     # If any fuzzy match exists, just make the whole sentence green
     if any(m.is_fuzzy for m in matches):
         return f"{COLOR_MAP['GREEN']}{sentence}{Style.RESET_ALL}"
 
-    # Otherwise, highlight exact matches
+    # Otherwise, highlight exact matches.
+    # Each keyword is substituted once: one sub already colors every occurrence, so further
+    # matches for the same keyword would only re-wrap text that is already colored.
+    reset = Style.RESET_ALL if Style else ""
+    done = set()
     for m in matches:
+        if m.keyword in done:
+            continue
+        done.add(m.keyword)
         color = kw_color_map.get(m.keyword, "")
-        reset = Style.RESET_ALL if Style else ""
-        pattern = r'\b' + re.escape(m.keyword) + r'\b'
-        result = re.sub(pattern, lambda mt: f"{color}{mt.group(0)}{reset}", result, flags=flags)
+        pattern = compiled_whole_word(m.keyword, not case_sensitive)
+        # String template instead of a lambda: \g<0> re-inserts the matched text
+        # (keeping its original case), and re expands it in C without calling back into Python.
+        result = pattern.sub(_replacement(color, reset), result)
 
     return result
@@ -1,15 +1,35 @@
 # Interactive multi-keyword search with:
 #  - distinct colors per keyword
 #  - context preview (snippet around the match)
-#  - list of matches (file + snippet)
-#  - interactive navigation: n (next), p (prev), number (jump), o (open in editor), q (quit)
+#  - list of matches (file + snippet), one page at a time
+#  - interactive navigation: n (next), p (prev), number (jump), o (open in editor), l (more previews), q (quit)
 
 import os  # for file and path handling, launching OS commands
+import sys  # for writing the preview list straight to stdout
 
 from .highlight import highlight_sentence_with_colors, CHAPTERS_FOLDER
 from .open_in_pycharm import open_in_pycharm, compute_match_file_line
 
 
+# How many preview lines are printed at once; 'l' prints the next page.
+# Big result sets (thousands of matches) would otherwise be highlighted + printed in full up front.
+PREVIEW_PAGE_SIZE = 50
+
+
+def _print_previews(matches, page_start, highlight):
+    """
+    Print one page of previews (index + filename + colored snippet) starting at page_start,
+    as a single write. Returns where the next page starts (0 after the last page → wraps around).
+    """
+    page_end = min(page_start + PREVIEW_PAGE_SIZE, len(matches))
+    lines = [f"{i:04d}. {m.file} - {highlight(m.snippet, m)}\n"
+             for i, m in enumerate(matches[page_start:page_end], start=page_start + 1)]
+    if page_end < len(matches):
+        lines.append(f"... showing {page_start + 1}-{page_end} of {len(matches)} (type 'l' for more)\n")
+    sys.stdout.write("".join(lines))
+    return page_end if page_end < len(matches) else 0
+
+
 def interactive_navigation(matches, keywords, kw_color_map, case_sensitive=False):
     """
     Presents matches previews and allows interactive navigation.
@@ -20,6 +40,7 @@ def interactive_navigation(matches, keywords, kw_color_map, case_sensitive=False
       - o          : open current match file in PyCharm (or fallback)
       - q          : quit navigation
       - f          : filter results by word (case-insensitive)
+      - l          : list the next page of previews
     The function prints the highlighted sentence and a snippet for each match.
     """
     # If no matches, inform and return early
@@ -27,25 +48,34 @@ def interactive_navigation(matches, keywords, kw_color_map, case_sensitive=False
         print("No matches found.")
         return
 
-    # Print a summary list of matches (index + filename + colored snippet)
-    print(f"\nFound {len(matches)} matches. Showing previews (context snippets):\n")
-    for i, m in enumerate(matches, start=1):
-        # Use color highlighting in the preview snippet
-        preview = highlight_sentence_with_colors(m.snippet, [m], keywords, kw_color_map, case_sensitive=case_sensitive)
-        print(f"{i:04d}. {m.file} - {preview}")
+    # Highlighted text is memoized per (text, keyword, fuzzy) for this navigation session:
+    # several matches often share a sentence, and moving back and forth re-shows the same ones.
+    # (Those are the only Match fields the highlighter looks at.)
+    highlighted = {}
+
+    def highlight(text, m):
+        key = (text, m.keyword, m.is_fuzzy)
+        colored = highlighted.get(key)
+        if colored is None:
+            colored = highlighted[key] = highlight_sentence_with_colors(
+                text, [m], keywords, kw_color_map, case_sensitive=case_sensitive)
+        return colored
 
+    # Print the first page of the summary list (index + filename + colored snippet)
+    print(f"\nFound {len(matches)} matches. Showing previews (context snippets):\n")
+    next_page = _print_previews(matches, 0, highlight)
 
     # Navigation index (0-based)
     idx = 0
-    print("\nNavigation commands: 'n' = next, 'p' = previous, a number = jump, 'o' = open in editor, 'q' = quit")
+    print("\nNavigation commands: 'n' = next, 'p' = previous, a number = jump, 'o' = open in editor, "
+          "'l' = more previews, 'q' = quit")
 
     # Loop until user quits
     while True:
         current = matches[idx]
         # Show full sentence with colors applied
         # When showing full sentence
-        full_colored = highlight_sentence_with_colors(current.sentence, [current], keywords, kw_color_map,
-                                                      case_sensitive=case_sensitive)
+        full_colored = highlight(current.sentence, current)
         print("\n" + "="*80)
         print(f"Match {idx+1}/{len(matches)}  —  File: {current.file}  —  Keyword: {current.keyword}")
         print("- Full sentence (highlighted):")
@@ -56,7 +86,7 @@ def interactive_navigation(matches, keywords, kw_color_map, case_sensitive=False
         print("="*80)
 
         # Read command from user
-        cmd = input("\nNavigation [n=next, p=prev, o=open, f=filter, q=quit]: ").strip()
+        cmd = input("\nNavigation [n=next, p=prev, o=open, f=filter, l=list, q=quit]: ").strip()
 
         # Quit commands
         if cmd.lower() in ("q", "quit", "exit"):
@@ -79,10 +109,17 @@ def interactive_navigation(matches, keywords, kw_color_map, case_sensitive=False
             if filtered:
                 matches = filtered
                 idx = 0
+                next_page = 0  # 'l' lists the filtered results from the top
             else:
                 print("⚠️ No results after filter.")
             continue
 
+        # List the next page of previews (wraps around after the last page)
+        if cmd.lower() == "l":
+            print()
+            next_page = _print_previews(matches, next_page, highlight)
+            continue
+
         # Open in editor: compute line and open
         if cmd.lower() == "o":
             # Compute file path relative to CHAPTERS_FOLDER
@@ -109,4 +146,4 @@ def interactive_navigation(matches, keywords, kw_color_map, case_sensitive=False
                 print(f"Number out of range. Enter 1..{len(matches)}")
         except ValueError:
             # Unrecognized command
-            print("Unknown command. Use 'n', 'p', a number, 'o' to open file, or 'q' to quit.")
\ No newline at end of file
+            print("Unknown command. Use 'n', 'p', a number, 'o' to open file, 'l' for more previews, or 'q' to quit.")
\ No newline at end of file
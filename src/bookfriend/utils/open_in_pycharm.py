@@ -3,6 +3,8 @@
 import os                         # for file and path handling, launching OS commands
 import sys                        # for sys.exit and platform detection
 import subprocess                 # for launching external programs (like editor)
+from bisect import bisect_left    # to turn a file offset into a line number
+from functools import lru_cache   # to remember where the launcher lives
 from shutil import which          # to check if an executable exists on PATH
 
 
@@ -12,6 +14,17 @@ from shutil import which          # to check if an executable exists on PATH
 PYCHARM_LAUNCHER_CMD = "charm"
 
 
+@lru_cache(maxsize=4)
+def _launcher_path(cmd):
+    """
+    Absolute path of 'cmd' on PATH, or None.
+    Cached: which() stats every PATH entry, and the answer doesn't change between 'o' presses.
+    (Keyed on the command so changing PYCHARM_LAUNCHER_CMD still takes effect;
+    _launcher_path.cache_clear() re-checks PATH.)
+    """
+    return which(cmd)
+
+
 def open_in_pycharm(file_path, line=None, column=None):
     """
     Try to open the given file in PyCharm at the given line (and optional column).
@@ -31,26 +44,28 @@ def open_in_pycharm(file_path, line=None, column=None):
     file_path = os.path.abspath(file_path)
 
     # 1) If `charm` exists on PATH, try to use it with line number if supported.
-    if which(PYCHARM_LAUNCHER_CMD):
+    # The resolved absolute path is passed to Popen, so it doesn't search PATH again either.
+    charm = _launcher_path(PYCHARM_LAUNCHER_CMD)
+    if charm:
         try:
             # Some 'charm' versions accept 'charm file:line' or 'charm --line line file'
             # We'll try both forms; if first fails, second may work.
             if line:
                 # Try "charm file:line" first (common)
                 try:
-                    subprocess.Popen([PYCHARM_LAUNCHER_CMD, f"{file_path}:{line}"])
+                    subprocess.Popen([charm, f"{file_path}:{line}"])
                     return True
                 except Exception:
                     # Fall back to explicit --line if available
                     try:
-                        subprocess.Popen([PYCHARM_LAUNCHER_CMD, "--line", str(line), file_path])
+                        subprocess.Popen([charm, "--line", str(line), file_path])
                         return True
                     except Exception:
                         # Give up on charm method
                         pass
             else:
                 # No line number requested, just open file
-                subprocess.Popen([PYCHARM_LAUNCHER_CMD, file_path])
+                subprocess.Popen([charm, file_path])
                 return True
         except Exception:
             # If anything fails with charm, we will fall back below
@@ -75,6 +90,33 @@ def open_in_pycharm(file_path, line=None, column=None):
         return False
 
 
+# Per-file data for compute_match_file_line, so jumping to several matches in the same chapter
+# reads and scans the file only once. Reused while the file's (mtime_ns, size) is unchanged.
+_LINE_CACHE = {}  # path -> (stamp, full text, newline offsets, {sentence: offset in file})
+
+
+def _load_line_index(file_path):
+    """
+    Return (full text, sorted offsets of every '\\n', sentence-offset memo) for file_path.
+    The newline offsets let a bisect find the line of any file offset in O(log lines).
+    """
+    st = os.stat(file_path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    hit = _LINE_CACHE.get(file_path)
+    if hit and hit[0] == stamp:
+        return hit[1], hit[2], hit[3]
+
+    with open(file_path, "r", encoding="utf-8") as fh:
+        full = fh.read()
+    newlines = []
+    i = full.find("\n")
+    while i != -1:
+        newlines.append(i)
+        i = full.find("\n", i + 1)
+    sentence_offsets = {}
+    _LINE_CACHE[file_path] = (stamp, full, newlines, sentence_offsets)
+    return full, newlines, sentence_offsets
+
 
 def compute_match_file_line(file_path, sentence, match_start_in_sentence):
     """
@@ -84,15 +126,15 @@ def compute_match_file_line(file_path, sentence, match_start_in_sentence):
       - Find the first occurrence of the sentence in the file (we assume the sentence text is unique enough).
       - Compute the absolute character offset where the match occurs:
           file_offset = sentence_offset_in_file + match_start_in_sentence
-      - Convert file_offset to line number by counting newlines before that offset.
+      - Convert file_offset to line number by counting newlines before that offset
+        (bisect over the file's cached newline offsets).
     Returns (line_number, column) both 1-based, or (None, None) if we can't find the sentence.
     Why:
       - Editors usually accept a line number to jump to; we compute it precisely.
       - Using the sentence search is robust if sentence boundaries are preserved in the file.
     """
     try:
-        with open(file_path, "r", encoding="utf-8") as fh:
-            full = fh.read()
+        full, newlines, sentence_offsets = _load_line_index(file_path)
     except Exception as e:
         # If we can't open the file, return None values (caller will handle fallback)
         print(f"[ERROR] Could not read file to compute line number: {e}")
@@ -100,24 +142,27 @@ def compute_match_file_line(file_path, sentence, match_start_in_sentence):
 
     # Try to locate the sentence inside the full file text
     # We attempt an exact match; if the sentence is present multiple times, this picks the first.
-    idx = full.find(sentence)
-    if idx == -1:
-        # As a fallback, try a best-effort: search by the snippet (shorter string)
-        # This helps if sentence splitting trimmed whitespace differently.
-        snippet = sentence.strip()
-        idx = full.find(snippet)
+    idx = sentence_offsets.get(sentence)
+    if idx is None:
+        idx = full.find(sentence)
         if idx == -1:
-            return None, None
+            # As a fallback, try a best-effort: search by the snippet (shorter string)
+            # This helps if sentence splitting trimmed whitespace differently.
+            snippet = sentence.strip()
+            idx = full.find(snippet)
+        sentence_offsets[sentence] = idx  # remember misses too
+    if idx == -1:
+        return None, None
 
     # file_offset is where the sentence starts in the file.
     file_offset = idx + match_start_in_sentence
 
-    # Compute 1-based line number by counting '\n' up to file_offset
-    line_number = full.count("\n", 0, file_offset) + 1
-    # Compute column by finding the last newline before file_offset
-    last_nl = full.rfind("\n", 0, file_offset)
-    if last_nl == -1:
+    # Compute 1-based line number from the number of '\n' before file_offset
+    newlines_before = bisect_left(newlines, file_offset)
+    line_number = newlines_before + 1
+    # Compute column from the last newline before file_offset
+    if newlines_before == 0:
         column = file_offset + 1  # no newline before → column is offset+1 (1-based)
     else:
-        column = file_offset - last_nl
+        column = file_offset - newlines[newlines_before - 1]
     return line_number, column
\ No newline at end of file
@@ -1,10 +1,208 @@
 import faiss
 import pickle
+import re
+import threading
+from functools import lru_cache
+import numpy as np
 from sentence_transformers import SentenceTransformer
 import os
 
-# Load model only once (Global cache)
-SEM_MODEL = SentenceTransformer("all-MiniLM-L6-v2")
+from .embedding_cache import QueryEmbeddingCache
+
+# Load model only once (Global cache) — on first use, shared by query encoding and
+# in-process index builds (see get_model).
+_MODEL = None
+_MODEL_LOCK = threading.Lock()
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Query embeddings are remembered on disk (see encode_query), in the bookfriend folder
+# wherever the CLI / API is started from; None disables the cache
+QUERY_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "query_embeddings.db")
+QUERY_CACHE_MAX_ROWS = 50_000  # ~75MB of embeddings at most; the oldest are dropped past this
+_QUERY_CACHE = QueryEmbeddingCache(QUERY_CACHE_PATH, MODEL_NAME, QUERY_CACHE_MAX_ROWS) if QUERY_CACHE_PATH else None
+
+
+def get_model():
+    """Return the process-wide SentenceTransformer, loading it on the first call."""
+    global _MODEL
+    if _MODEL is None:
+        with _MODEL_LOCK:  # two threads asking at once still load it only once
+            if _MODEL is None:
+                _MODEL = SentenceTransformer(MODEL_NAME)
+    return _MODEL
+
+# Recall vs speed knobs for the approximate indexes build_index.py makes for big books
+# (flat indexes ignore them):
+HNSW_EF_SEARCH = 64  # candidates an HNSW index explores per query
+IVF_NPROBE = 16      # inverted lists an IVF-PQ index scans per query (PQ codes are cheap
+                     # to score, so scanning more lists buys back recall for little time)
+
+# FAISS >= 1.7.3 can restrict a search to some ids (search-time IDSelectors). Older builds
+# over-fetch SHIELD_OVERFETCH x top_k results instead and drop the later chapters with numpy.
+HAS_SEARCH_SELECTORS = hasattr(faiss, "SearchParameters")
+SHIELD_OVERFETCH = 10
+
+# Spoiler Shield selectors kept per book (one per distinct chapter limit queried)
+MAX_CACHED_SELECTORS = 64
+
+# Everything that is not a digit; removing it leaves the chapter number ("chapter_012.txt" -> "012")
+_NON_DIGITS = re.compile(r"\D+")
+
+# Chapter number used for files without digits in their name: they always pass the Spoiler Shield
+NO_CHAPTER = -1
+
+
+def chapter_number(fname):
+    """Chapter number of a chapter filename ("chapter_005.txt" -> 5), or NO_CHAPTER."""
+    digits = _NON_DIGITS.sub("", fname)
+    return int(digits) if digits else NO_CHAPTER
+
+
+class TextColumn:
+    """
+    Chunk texts stored as one UTF-8 byte blob + offsets (text i is blob[offsets[i]:offsets[i+1]]).
+    Loads as two plain arrays, with no Python object per chunk; a text is only decoded
+    when it is read (a query reads a handful).
+    """
+    __slots__ = ("blob", "offsets")
+
+    def __init__(self, blob, offsets):
+        self.blob = blob        # uint8 numpy array
+        self.offsets = offsets  # int64 numpy array, len(texts) + 1 entries
+
+    @classmethod
+    def from_strings(cls, texts):
+        encoded = [t.encode("utf-8") for t in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+
+class NameColumn:
+    """
+    Chapter filenames stored as a table of distinct names + one int32 id per chunk
+    (name i is names[ids[i]]). A book has thousands of chunks but far fewer chapters,
+    so loading this builds no per-chunk Python list.
+    """
+    __slots__ = ("names", "ids")
+
+    def __init__(self, names, ids):
+        self.names = names  # list of str, one per distinct filename
+        self.ids = ids      # int32 numpy array, one entry per chunk
+
+    @classmethod
+    def from_strings(cls, files):
+        name_ids = {}
+        ids = np.array([name_ids.setdefault(f, len(name_ids)) for f in files], dtype=np.int32)
+        return cls(list(name_ids), ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        return self.names[self.ids[i]]
+
+
+class ChunkTable:
+    """
+    Metadata of every indexed chunk, stored column-wise: row i describes FAISS id i.
+      - files:     chapter filename per chunk (NameColumn, or a list of str)
+      - chap_nums: chapter number per chunk (int64 numpy array, NO_CHAPTER if the name has none)
+      - texts:     chunk text (TextColumn, or a list of str)
+    Saved as a .npz of plain arrays (see save): loading it is ~2.5x faster than unpickling
+    the same columns. The Spoiler Shield compares chap_nums for all candidates in one numpy operation.
+    """
+    __slots__ = ("files", "chap_nums", "texts", "_selectors")
+
+    def __init__(self, files, chap_nums, texts):
+        self.files = files
+        self.chap_nums = np.asarray(chap_nums, dtype=np.int64)
+        self.texts = texts
+        self._selectors = {}  # max_chapter -> FAISS IDSelector (see chapter_selector)
+
+    def chapter_selector(self, max_chapter):
+        """
+        FAISS IDSelector accepting only chunks up to max_chapter (files without a chapter
+        number always pass), or None when every chunk passes. Cached per limit.
+        """
+        if max_chapter not in self._selectors:
+            allowed = np.flatnonzero(self.chap_nums <= max_chapter)  # int64, as FAISS ids
+            if len(allowed) == len(self.chap_nums):
+                selector = None
+            elif len(allowed) and allowed[-1] - allowed[0] + 1 == len(allowed):
+                # Chapters are indexed in order, so the allowed ids are usually one range
+                selector = faiss.IDSelectorRange(int(allowed[0]), int(allowed[-1]) + 1)
+            else:
+                selector = faiss.IDSelectorBatch(len(allowed), faiss.swig_ptr(allowed))
+            if len(self._selectors) >= MAX_CACHED_SELECTORS:
+                self._selectors.clear()
+            self._selectors[max_chapter] = selector
+        return self._selectors[max_chapter]
+
+    def __len__(self):
+        return len(self.texts)
+
+    def save(self, path):
+        """Write the table to 'path' (.npz): filenames as a small name table + one id per chunk."""
+        files = self.files if isinstance(self.files, NameColumn) else NameColumn.from_strings(self.files)
+        texts = self.texts if isinstance(self.texts, TextColumn) else TextColumn.from_strings(self.texts)
+        with open(path, "wb") as f:  # (a file object, so numpy doesn't append its own .npz)
+            np.savez(
+                f,
+                file_names=np.array(files.names, dtype=str),
+                file_ids=files.ids,
+                chap_num=self.chap_nums,
+                text_blob=texts.blob,
+                text_offsets=texts.offsets,
+            )
+
+    @classmethod
+    def load(cls, path):
+        """Read a table written by save()."""
+        with np.load(path) as data:
+            files = NameColumn(data["file_names"].tolist(), data["file_ids"])
+            texts = TextColumn(data["text_blob"], data["text_offsets"])
+            return cls(files, data["chap_num"], texts)
+
+    @classmethod
+    def from_pickle(cls, data):
+        """
+        Build from a .pkl mapping written by older builds: a columns dict,
+        or a list of dicts / (file, chunk) tuples.
+        """
+        if isinstance(data, dict):
+            return cls(data["file"], data["chap_num"], data["text"])
+
+        files, texts = [], []
+        for entry in data:
+            # === 🛡️ FIX: Handle Dictionary Format ===
+            if isinstance(entry, dict):
+                files.append(entry.get("file", "unknown"))
+                texts.append(entry.get("text", ""))
+            else:
+                # Fallback for old Tuple format (filename, chunk)
+                files.append(entry[0])
+                texts.append(entry[1])
+        return cls(files, [chapter_number(f) for f in files], texts)
+
+
+# The index build_index.py writes when run without arguments (in the bookfriend folder); used by the CLI
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "semantic_index.faiss")
+
+
+def load_semantic_index(index_path=DEFAULT_INDEX_PATH):
+    """
+    Load the CLI's index and its ChunkTable. Chapter numbers are parsed from the filenames
+    once here (or read from the .npz), so the Spoiler Shield only compares integers per query.
+    """
+    return load_semantic_index_from_path(index_path)
+
 
 def load_semantic_index_from_path(index_path):
     """
@@ -14,37 +212,101 @@ def load_semantic_index_from_path(index_path):
         raise FileNotFoundError(f"Index not found at {index_path}")
 
     index = faiss.read_index(index_path)
+    if hasattr(index, "hnsw"):  # built by build_index.py for big books
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+    elif hasattr(index, "nprobe"):
+        index.nprobe = IVF_NPROBE
 
-    # Derive mapping path from index path (e.g. index_123.faiss -> index_123.pkl)
-    mapping_path = index_path.replace(".faiss", ".pkl")
+    # Derive mapping path from index path (e.g. index_123.faiss -> index_123.npz;
+    # indexes built before the .npz format have an index_123.pkl instead)
+    mapping_path = index_path.replace(".faiss", ".npz")
+    legacy_path = index_path.replace(".faiss", ".pkl")
 
     if os.path.exists(mapping_path):
-        with open(mapping_path, 'rb') as f:
-            mapping = pickle.load(f)
+        mapping = ChunkTable.load(mapping_path)
+    elif os.path.exists(legacy_path):
+        with open(legacy_path, 'rb') as f:
+            mapping = ChunkTable.from_pickle(pickle.load(f))
     else:
-        mapping = []
+        mapping = ChunkTable([], [], [])
         print(f"⚠️ Warning: No mapping file found at {mapping_path}")
 
     return index, mapping
 
 
-def semantic_search(query, index, mapping, top_k=5):
-    """Perform semantic search on the FAISS index."""
-    query_vec = SEM_MODEL.encode([query], convert_to_numpy=True)
-    distances, indices = index.search(query_vec, top_k)
-    results = []
-    for idx, dist in zip(indices[0], distances[0]):
-        if idx < len(mapping):
-            entry = mapping[idx]
+def _search_params(index, selector):
+    """Search parameters restricting 'index' to 'selector' (keeping the recall knobs set at load)."""
+    if hasattr(index, "hnsw"):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    if hasattr(index, "nprobe"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    return faiss.SearchParameters(sel=selector)
+
+
+def encode_query(query):
+    """
+    Embed a query the same way build_index.py embeds chunks (L2-normalized), shape (1, dim).
+    Inner products between these vectors are cosine similarities.
+    A query seen before (exact same text) is not encoded again: recent ones come from an
+    in-memory LRU, older ones from the on-disk cache.
+    """
+    # (a fresh, writable array per call: callers may hand it to FAISS or keep it)
+    return np.frombuffer(_encode_query_bytes(query), dtype=np.float32).reshape(1, -1).copy()
+
+
+@lru_cache(maxsize=512)  # values are immutable bytes, ~1.5KB each (~768KB when full)
+def _encode_query_bytes(query):
+    if _QUERY_CACHE is not None:
+        cached = _QUERY_CACHE.get(query)
+        if cached is not None:
+            return cached.tobytes()
+
+    query_vec = get_model().encode([query], convert_to_numpy=True, normalize_embeddings=True)
+    query_vec = np.asarray(query_vec[0], dtype=np.float32)
+    if _QUERY_CACHE is not None:
+        _QUERY_CACHE.put(query, query_vec)
+    return query_vec.tobytes()
+
+
+def semantic_search(query, index, mapping, top_k=5, query_vec=None, max_chapter=None):
+    """
+    Perform semantic search on the FAISS index ('mapping' is the index's ChunkTable).
+    Pass query_vec (from encode_query) when the query is already embedded, to skip encoding it again
+    (otherwise encode_query embeds it, through the on-disk query cache).
+    Spoiler Shield: with max_chapter, FAISS itself only considers chunks up to that chapter
+    (an IDSelector over the chunk ids), so top_k results are the best *allowed* ones and nothing
+    needs over-fetching and throwing away. (Without selector support, see HAS_SEARCH_SELECTORS.)
+    """
+    if query_vec is None:
+        query_vec = encode_query(query)
+
+    if max_chapter is not None and not HAS_SEARCH_SELECTORS:
+        return _shielded_search_fallback(index, mapping, query_vec, top_k, max_chapter)
+
+    selector = mapping.chapter_selector(max_chapter) if max_chapter is not None else None
+    if selector is None:
+        distances, indices = index.search(query_vec, top_k)
+    else:
+        distances, indices = index.search(query_vec, top_k, params=_search_params(index, selector))
+    return _results(mapping, indices[0], distances[0])
+
+
+def _shielded_search_fallback(index, mapping, query_vec, top_k, max_chapter):
+    """Spoiler Shield for FAISS builds without selectors: over-fetch, then one numpy mask."""
+    distances, indices = index.search(query_vec, top_k * SHIELD_OVERFETCH)
+    ids, dists = indices[0], distances[0]
+    valid = (ids >= 0) & (ids < len(mapping))
+    valid[valid] = mapping.chap_nums[ids[valid]] <= max_chapter
+    # FAISS already returns results best first, so the first top_k kept ones are the best
+    # allowed ones (no sort / argpartition needed)
+    return _results(mapping, ids[valid][:top_k], dists[valid][:top_k])
 
-            # === 🛡️ FIX: Handle Dictionary Format ===
-            if isinstance(entry, dict):
-                filename = entry.get("file", "unknown")
-                chunk = entry.get("text", "")
-            else:
-                # Fallback for old Tuple format (filename, chunk)
-                filename, chunk = entry
 
-            results.append((filename, chunk, dist))
+def _results(mapping, ids, dists):
+    """Hydrate FAISS ids into (file, text, dist) tuples; only the returned chunks are decoded."""
+    # Approximate indexes pad with id -1 when they find fewer than top_k results
+    valid = (ids >= 0) & (ids < len(mapping))
+    ids, dists = ids[valid], dists[valid]
 
-    return results
\ No newline at end of file
+    files, texts = mapping.files, mapping.texts
+    return [(files[idx], texts[idx], dist) for idx, dist in zip(ids.tolist(), dists.tolist())]
\ No newline at end of file
@@ -1,10 +1,129 @@
+import atexit
+import hashlib
 import json
+import os
+import tempfile
+import threading
+from collections import deque
 from pathlib import Path
 
+# orjson (optional) encodes/decodes several times faster than the stdlib json module
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _to_json(obj):
+    """Serialize what json can't on its own: deques (e.g. search_history) become lists."""
+    if isinstance(obj, deque):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(data) -> bytes:
+    if orjson is not None:
+        # NON_STR_KEYS: write int keys as strings, like json does
+        return orjson.dumps(data, default=_to_json, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, indent=2, default=_to_json).encode('utf-8')
+
+
+def _loads(content: bytes):
+    return orjson.loads(content) if orjson is not None else json.loads(content)
+
+
+# path -> digest of the content this process last wrote there (see save_session_if_changed)
+_last_saved = {}
+
+
+def _write(content: bytes, path) -> None:
+    # Write a temp file next to it, then swap it in: os.replace is atomic, so the session file
+    # is always either the old or the new version (never half-written after a Ctrl-C / crash).
+    # The temp name is unique, so two threads saving at once never replace each other's file.
+    path = os.fspath(path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), prefix=f"{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+    _last_saved[str(path)] = hashlib.blake2b(content).digest()
+
 
 def save_session(data:dict, path:str)->None:
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent = 2)
+    _write(_dumps(data), path)
+
+
+def save_session_if_changed(data:dict, path:str)->bool:
+    """
+    Save the session only if its content differs from what was last saved to 'path'
+    (several saves in a row with nothing new in between write the file once).
+    Returns True if the file was written.
+    """
+    content = _dumps(data)
+    if _last_saved.get(str(path)) == hashlib.blake2b(content).digest() and os.path.exists(path):
+        return False
+    _write(content, path)
+    return True
+
+
+class SessionWriter:
+    """
+    Saves a session dict from a background thread, debounced: callers only mark_dirty() after
+    changing it, and all changes made within 'interval' seconds are written together, once.
+    close() (also run at exit) writes whatever is still pending.
+    """
+
+    def __init__(self, data:dict, path:str, interval:float = 1.0):
+        self.data = data
+        self.path = path
+        self.interval = interval
+        self._dirty = threading.Event()
+        self._closed = threading.Event()
+        self._lock = threading.Lock()  # one write at a time (background thread vs flush/close)
+        self._thread = threading.Thread(target=self._run, name="session-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def mark_dirty(self)->None:
+        """Note that the session changed; it is written within 'interval' seconds."""
+        self._dirty.set()
+
+    def flush(self)->None:
+        """Write the session now if it changed since the last write."""
+        with self._lock:
+            if not self._dirty.is_set():
+                return
+            self._dirty.clear()
+            try:
+                save_session_if_changed(self.data, self.path)
+            except RuntimeError:
+                # the main thread changed the data mid-write (e.g. "deque mutated during
+                # iteration"); it is dirty again anyway, the next pass writes it
+                self._dirty.set()
+            except OSError as e:
+                # e.g. disk full: keep the change pending (and the thread alive) for the next pass
+                print(f"⚠️ Could not save session: {e}")
+                self._dirty.set()
+
+    def close(self)->None:
+        """Stop the background thread and write any pending change."""
+        if not self._closed.is_set():
+            self._closed.set()
+            self._dirty.set()  # wake the thread so it sees _closed
+            self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while True:
+            self._dirty.wait()                # sleep until something changed
+            if self._closed.wait(self.interval):  # gather the changes of the next 'interval' s
+                return
+            self.flush()
 
 
 def load_session(path:str)->dict:
@@ -12,12 +131,12 @@ def load_session(path:str)->dict:
     if not Path(path).exists():
         return{}
     try:
-        with open(path, 'r', encoding='utf-8') as f:
+        with open(path, 'rb') as f:
             content = f.read().strip()
             if not content:  # file exists but is empty
                 return {}
-            return json.loads(content)
-    except (json.JSONDecodeError, OSError):
+            return _loads(content)
+    except (ValueError, OSError):  # (json's and orjson's decode errors are ValueErrors)
         print(f"[WARN] Session file corrupted → starting fresh.")
         return {}
 
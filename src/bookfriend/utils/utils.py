@@ -1,9 +1,8 @@
 # =========================
 # FUNCTION: keyword_in_sentence
 # =========================
-import re
-
 from bookfriend.utils.config import CASE_SENSITIVE_MODE
+from bookfriend.utils.whole_word_pattern import compiled_whole_word, has_whole_word, is_plain_word
 
 
 def keyword_in_sentence(keywords, sentence):
@@ -13,16 +12,33 @@ def keyword_in_sentence(keywords, sentence):
     Purpose: Avoids partial matches and ensures quick yes/no decision before doing more work.
     """
     # Same case-sensitivity setup as before.
-    flags = 0 if CASE_SENSITIVE_MODE else re.IGNORECASE
+    ignore_case = not CASE_SENSITIVE_MODE
+
+    # Haystack for the cheap substring prefilter (lowercased once, not once per keyword).
+    haystack = sentence.lower() if ignore_case else sentence
 
     # Loop through all user keywords.
     for keyword in keywords:
-        # Same regex whole-word boundary technique to avoid false positives inside other words.
-        pattern = r'\b' + re.escape(keyword) + r'\b'
+        needle = keyword.lower() if ignore_case else keyword
+
+        # Plain ASCII words: str.find + two character tests. No separate 'in' check first —
+        # has_whole_word's own first find already rejects sentences without the word.
+        if is_plain_word(keyword):
+            if has_whole_word(haystack, needle):
+                return True
+            continue
+
+        # Fast path: str's C-level substring search rules out most sentences,
+        # so the regex only runs to confirm the whole-word boundary.
+        if needle not in haystack:
+            continue
+
+        # Cached whole-word regex (compiled once per keyword) to avoid false positives inside other words.
+        pattern = compiled_whole_word(keyword, ignore_case)
 
-        # re.search → Searches for the first occurrence of the pattern in the sentence.
+        # pattern.search → Searches for the first occurrence of the keyword in the sentence.
         # If found → return True immediately (no need to check more keywords).
-        if re.search(pattern, sentence, flags):
+        if pattern.search(sentence):
             return True
 
     # If loop finishes without finding a match → return False.
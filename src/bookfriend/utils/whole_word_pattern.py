@@ -1,4 +1,21 @@
 import re                         # for regex searching and substitution
+from functools import lru_cache   # to memoize compiled patterns across calls
+                                  # (bounded, so a long session of one-off keywords can't grow it forever)
+
+# Optional: the third-party 'regex' module finds literal keywords much faster than stdlib re
+# (it searches for the literal first instead of trying \b at every position).
+# If it isn't installed, the same patterns are compiled with re.
+# (google-re2 was tried too: slower than 'regex' on chapter text, and its \b only knows
+#  ASCII word characters, so 'caf' would match inside 'café'.)
+try:
+    import regex as _engine
+    _ENGINE_FLAGS = _engine.VERSION0  # re-compatible behaviour (simple case folding, same \b)
+except ImportError:
+    _engine = re
+    _ENGINE_FLAGS = 0
+
+# True when patterns are compiled with 'regex' (callers can skip their own workarounds for slow re)
+HAS_FAST_REGEX = _engine is not re
 
 
 def whole_word_pattern(keyword):
@@ -10,6 +27,49 @@ def whole_word_pattern(keyword):
     return r'\b' + re.escape(keyword) + r'\b'
 
 
+def is_word_char(ch):
+    """Same notion of a 'word' character as regex \\w (letters, digits, underscore)."""
+    return ch.isalnum() or ch == "_"
+
+
+def is_plain_word(keyword):
+    """True for ASCII keywords made only of word characters (e.g. 'Klein', 'red_moon')."""
+    return keyword.isascii() and keyword.isidentifier()
 
 
+def has_whole_word(text, word):
+    """
+    str.find-based equivalent of compiled_whole_word(word).search(text) for plain words
+    (see is_plain_word): a hit counts only if no word character touches it on either side.
+    Why: str.find is a C-level substring search, so this skips the regex engine entirely.
+    """
+    n = len(word)
+    i = text.find(word)
+    while i != -1:
+        left_ok = i == 0 or not is_word_char(text[i - 1])
+        right_ok = i + n == len(text) or not is_word_char(text[i + n])
+        if left_ok and right_ok:
+            return True
+        i = text.find(word, i + 1)
+    return False
+
 
+@lru_cache(maxsize=256)
+def compiled_whole_word(keyword, ignore_case=True):
+    """
+    Return the compiled whole-word regex for 'keyword' (cached per keyword + case mode).
+    Why: keyword_in_sentence and the highlighters run once per sentence; compiling here
+    once per keyword skips the rebuild + re-cache lookup on every call.
+    """
+    # Case-insensitivity is baked into the pattern itself with the inline (?i) flag
+    return _engine.compile(("(?i)" if ignore_case else "") + whole_word_pattern(keyword), _ENGINE_FLAGS)
+
+
+@lru_cache(maxsize=256)
+def compiled_whole_word_bytes(keyword, ignore_case=True):
+    """
+    Bytes version of compiled_whole_word, for scanning raw (undecoded / mmap'ed) file data.
+    Only meant for ASCII keywords: bytes regexes fold case and see word characters in ASCII only.
+    """
+    pattern = rb'\b' + re.escape(keyword.encode("ascii")) + rb'\b'
+    return _engine.compile((b"(?i)" if ignore_case else b"") + pattern, _ENGINE_FLAGS)